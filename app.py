@@ -4,11 +4,26 @@ Uses design patterns: Configuration Management, Factory Pattern, Service Layer.
 """
 import streamlit as st
 import pandas as pd
-import re
-from typing import Optional
+import pyarrow as pa
 from config import config
 from services import OpenAIQueryGenerationService
 from summary_service import SummaryService
+from summary_detection import detect_summary_request
+
+# =========================
+# RESULT TABLE COLUMNS
+# =========================
+# Columns shown first in the results table, in display order
+
+_COMPARISON_PRIORITY_COLUMNS = ("testname", "previous_status", "current_status", "current_failure_stack")
+_SCRIPT_PRIORITY_COLUMNS = ("_time", "testname", "status", "execution_number", "owner", "failure_stack", "occurrence_count")
+_QUERY_PRIORITY_COLUMNS = ("testname", "status", "previous_status", "current_status",
+                           "duration", "owner", "failure_stack", "current_failure_stack",
+                           "occurrence_count")
+
+# Low-cardinality text columns stored as categoricals in the results table
+_CATEGORICAL_COLUMNS = ("status", "previous_status", "current_status", "environment", "owner")
+
 
 # =========================
 # STREAMLIT UI
@@ -61,310 +76,227 @@ with st.expander(" Query Examples - All Auto-Generated"):
         """)
 
 # Main input
-user_query = st.text_input(
-    "Ask anything about your test execution data",
-    placeholder="e.g., Show me failed tests in CSE environment",
-    key="user_input"
-)
+# Inside a form, typing in the box does not rerun the script; only submitting does
+with st.form("query_form"):
+    user_query = st.text_input(
+        "Ask anything about your test execution data",
+        placeholder="e.g., Show me failed tests in CSE environment",
+        key="user_input"
+    )
+    
+    generate_button = st.form_submit_button("Generate Summary", type="primary", use_container_width=True)
 
-generate_button = st.button("Generate Summary", type="primary", use_container_width=True)
+# Helper function to order result columns
+def order_columns(columns: tuple, priority_columns: tuple) -> list:
+    """
+    Order columns for display.
+    Returns: priority columns present in columns, then all other columns sorted
+    """
+    # Set lookups keep the reorder linear in the number of columns
+    column_set = set(columns)
+    
+    # Get priority columns that exist in the dataframe
+    existing_priority = [col for col in priority_columns if col in column_set]
+    
+    # Get all other columns not in priority list
+    other_columns = column_set.difference(priority_columns)
+    
+    # Combine: priority columns first, then others
+    return existing_priority + sorted(other_columns)
 
-# Helper function to detect summary requests
-def detect_summary_request(query: str) -> tuple[str, Optional[str]]:
+# Helper function to build the results table
+# Cached so Streamlit reruns reuse the frame instead of rebuilding it from the raw rows;
+# bounded because the cache is process-wide and shared by every session
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_display_df(data: list, priority_columns: tuple, deduplicate: bool = True) -> pd.DataFrame:
     """
-    Detect if the query is asking for a summary.
-    Returns: (summary_type, script_name_or_execution)
-    Summary types: 'build_summary', 'script_summary', 'flaky_summary', None
+    Build the DataFrame shown in the results table.
+    Duplicate testnames are collapsed into one row with an occurrence_count column.
+    Returns: DataFrame with priority columns first, then all other columns sorted
     """
-    query_lower = query.lower()
+    try:
+        # Arrow builds the columns in C++ instead of walking every dict in Python;
+        # pa.array infers one struct type over all rows, so late keys still become columns
+        df = pa.Table.from_struct_array(pa.array(data)).to_pandas()
+    except (pa.ArrowException, OverflowError, TypeError):
+        # Mixed value types in a column, integers past int64 (or no rows) - let pandas handle it
+        df = pd.DataFrame.from_records(data)
     
-    # Build summary detection - MUST come before script summary to avoid conflicts
-    build_summary_patterns = [
-        r"(?:give\s+me\s+)?about\s+build\s+(\d+)",
-        r"(?:give\s+me\s+)?about\s+execution\s+(\d+)",
-        r"(?:tell\s+me\s+)?about\s+build\s+(\d+)",
-        r"(?:tell\s+me\s+)?about\s+execution\s+(\d+)",
-        r"build\s+summary",
-        r"summary\s+of\s+build",
-        r"build\s+(\d+)\s+summary",
-        r"execution\s+(\d+)\s+summary",
-        r"latest\s+build\s+summary",
-        r"current\s+build\s+summary",
-        r"show\s+me\s+build\s+(\d+)",
-        r"show\s+me\s+execution\s+(\d+)",
-        r"info\s+about\s+build\s+(\d+)",
-        r"info\s+about\s+execution\s+(\d+)"
-    ]
-    for pattern in build_summary_patterns:
-        match = re.search(pattern, query_lower)
-        if match:
-            # Extract execution number if mentioned
-            if match.groups():
-                exec_num = match.group(1)
-            else:
-                exec_match = re.search(r"(?:build|execution)\s+(\d+)", query_lower)
-                exec_num = exec_match.group(1) if exec_match else None
-            return ("build_summary", exec_num)
+    # A handful of distinct values repeated on every row - categoricals store
+    # each value once and make the dedup groupby below cheaper
+    for col in _CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
     
-    # Script summary detection - improved to handle various formats
-    # First, try patterns with explicit keywords
-    script_patterns = [
-        r"about\s+(?:script|test)\s+([A-Za-z][A-Za-z0-9_]*)",
-        r"summary\s+of\s+(?:script|test)\s+([A-Za-z][A-Za-z0-9_]*)",
-        r"analyze\s+(?:script|test)\s+([A-Za-z][A-Za-z0-9_]*)",
-        r"tell\s+me\s+about\s+([A-Za-z][A-Za-z0-9_]*)",
-        r"give\s+me\s+about\s+([A-Za-z][A-Za-z0-9_]*)",
-        r"what\s+about\s+([A-Za-z][A-Za-z0-9_]*)",
-        r"explain\s+([A-Za-z][A-Za-z0-9_]*)"
-    ]
-    for pattern in script_patterns:
-        match = re.search(pattern, query_lower)
-        if match:
-            script_name = match.group(1)
-            return ("script_summary", script_name)
+    # Deduplicate testnames if they exist
+    if deduplicate and "testname" in df.columns:
+        # Check if there are duplicate testnames
+        if df["testname"].duplicated().any():
+            # Build aggregation dictionary for non-testname columns
+            # For numeric columns, take max (useful for counts, scores, durations);
+            # for string/object columns, take first
+            numeric_columns = set(df.select_dtypes(include="number").columns)
+            agg_dict = {
+                col: 'max' if col in numeric_columns else 'first'
+                for col in df.columns
+                if col != "testname"
+            }
+            
+            # Count occurrences before collapsing, from the frame we already have
+            counts = df["testname"].value_counts()
+            
+            # If agg_dict is empty (only testname column exists), use drop_duplicates
+            if not agg_dict:
+                # Only testname column - just remove duplicates
+                df = df.drop_duplicates(subset=["testname"], keep='first')
+            else:
+                # Group by testname and aggregate
+                df = df.groupby("testname", as_index=False).agg(agg_dict)
+            
+            # Add count column to show how many times each testname appeared
+            df["occurrence_count"] = df["testname"].map(counts)
     
-    # Handle "summary about <testname>" or "give me summary about <testname>"
-    # Use \S+ to capture all non-whitespace characters (handles long camelCase names)
-    summary_about_pattern = r"(?:give\s+me\s+)?summary\s+about\s+(\S+)"
-    match = re.search(summary_about_pattern, query_lower)
-    if match:
-        # Extract from original query to preserve camelCase
-        original_match = re.search(r"(?:give\s+me\s+)?summary\s+about\s+(\S+)", query, re.IGNORECASE)
-        if original_match:
-            script_name = original_match.group(1).strip()
-        else:
-            script_name = match.group(1).strip()
-        return ("script_summary", script_name)
+    ordered_columns = order_columns(tuple(df.columns), priority_columns)
+    df_display = df[ordered_columns] if ordered_columns else df
     
-    # Handle "about <testname>" without "script" or "test" keyword (must be a valid test name)
-    # BUT exclude if it's about a build/execution number
-    about_match = re.search(r"about\s+([A-Za-z][A-Za-z0-9_]*)", query_lower, re.IGNORECASE)
-    if about_match and not re.search(r"about\s+(?:script|test|build|execution)", query_lower):
-        # Check if the word after "about" is followed by a number (build/execution pattern)
-        # If so, skip this match as it's likely a build query
-        after_about = query_lower[about_match.end():].strip()
-        if not re.search(r"^\d+", after_about):  # Not followed by a number
-            # Get the actual test name from original query to preserve camelCase
-            original_match = re.search(r"about\s+([A-Za-z][A-Za-z0-9_]*)", query, re.IGNORECASE)
-            if original_match:
-                script_name = original_match.group(1)
-                return ("script_summary", script_name)
+    # Nullable/string dtypes let st.dataframe hand the frame to Arrow without
+    # re-inferring each object column cell by cell. Floats stay floats: otherwise
+    # a duration column would turn Int64 whenever every value happens to be whole.
+    return df_display.convert_dtypes(convert_integer=False)
+
+# Helper function to reuse the results table across reruns
+def get_display_df(result: dict, priority_columns: tuple, deduplicate: bool = True) -> pd.DataFrame:
+    """
+    Return the display DataFrame for result, building it only the first time it is shown.
+    The result dict itself is kept as the key (not its id()) so a new result
+    can never be mistaken for the cached one after the old dict is freed.
+    """
+    if st.session_state.get("_cached_df_result") is result:
+        return st.session_state["_cached_df"]
     
-    # Top 10 flaky scripts detection - using contains for flexibility
-    if "top" in query_lower and "flaky" in query_lower:
-        # Extract number if present
-        number_match = re.search(r"top\s+(\d+)", query_lower)
-        limit = int(number_match.group(1)) if number_match else 10
-        return ("top_flaky", limit)
+    df_display = build_display_df(result["data"], priority_columns, deduplicate)
+    st.session_state["_cached_df_result"] = result
+    st.session_state["_cached_df"] = df_display
+    return df_display
+
+# Helper function to render the results table shared by summary and query results
+def render_results_table(result: dict, priority_columns: tuple, total_label: str,
+                         unique_label: str = "Total", deduplicate: bool = True):
+    """
+    Show the results table and its row count message, or the raw rows if the table fails.
     
-    # Top 10 failing scripts detection - using contains for flexibility
-    if "top" in query_lower and "failing" in query_lower:
-        # Extract number if present
-        number_match = re.search(r"top\s+(\d+)", query_lower)
-        limit = int(number_match.group(1)) if number_match else 10
-        return ("top_failing", limit)
+    Args:
+        result: Session result holding "data" and "row_count"
+        priority_columns: Columns to show first
+        total_label: Prefix of the row count message when nothing was collapsed
+        unique_label: Prefix of the message when duplicate testnames were collapsed
+        deduplicate: Whether to collapse duplicate testnames
+    """
+    data = result["data"]
+    try:
+        df_display = get_display_df(result, priority_columns, deduplicate)
+        st.dataframe(df_display, use_container_width=True, height=400)
+        
+        # Show row count (original vs deduplicated)
+        row_count = result.get("row_count")
+        original_count = row_count if row_count is not None else len(data)
+        deduplicated_count = len(df_display)
+        if deduplicate and deduplicated_count < original_count:
+            st.info(f"{unique_label}: {deduplicated_count} unique testnames (from {original_count} total rows)")
+        else:
+            st.info(f"{total_label}: {original_count}")
+    except Exception as e:
+        st.error(f"Error displaying table: {str(e)}")
+        # Show raw data if DataFrame creation fails
+        with st.expander("View Raw Data"):
+            st.json(data[:10])
+
+# Summary handlers - each runs its SummaryService call and picks the query label
+def run_build_summary(param):
+    summary_result = SummaryService.generate_build_summary(param)
+    if summary_result["success"]:
+        return summary_result, f"Build Summary for Execution #{summary_result['execution_number']}"
+    return summary_result, "Build Summary"
+
+def run_script_summary(param):
+    summary_result = SummaryService.generate_script_summary(param)
+    if summary_result["success"]:
+        return summary_result, f"Script Summary for {summary_result['script_name']}"
+    return summary_result, f"Script Summary for {param}"
+
+def run_top_flaky(param):
+    limit = param if isinstance(param, int) else 10
+    return SummaryService.generate_top_flaky_scripts(limit), f"Top {limit} Flaky Scripts"
+
+def run_top_failing(param):
+    limit = param if isinstance(param, int) else 10
+    return SummaryService.generate_top_failing_scripts(limit), f"Top {limit} Failing Scripts"
+
+def run_flaky_summary(param):
+    return SummaryService.generate_flaky_scripts_summary(), "Flaky Scripts Summary"
+
+def run_build_comparison(param):
+    exec1, exec2 = None, None
+    if param and isinstance(param, tuple) and len(param) == 2:
+        exec1, exec2 = param
     
-    # Flaky scripts summary detection
-    flaky_patterns = [
-        r"flaky\s+scripts?\s+summary",
-        r"summary\s+of\s+flaky\s+scripts?",
-        r"flaky\s+tests?\s+summary",
-        r"unstable\s+scripts?\s+summary"
-    ]
-    for pattern in flaky_patterns:
-        if re.search(pattern, query_lower):
-            return ("flaky_summary", None)
+    summary_result = SummaryService.generate_build_comparison_summary(exec1, exec2)
+    if summary_result["success"]:
+        return summary_result, f"Build Comparison: {summary_result['execution1']} vs {summary_result['execution2']}"
+    return summary_result, "Build Comparison"
+
+# summary_type -> (handler, key holding table data, key holding row count, is_summary)
+# Results with is_summary=False are displayed as a regular table, not a summary
+_SUMMARY_HANDLERS = {
+    "build_summary": (run_build_summary, None, "total_scripts", True),
+    "script_summary": (run_script_summary, "executions", "total_executions", True),
+    "top_flaky": (run_top_flaky, "scripts", "total", False),
+    "top_failing": (run_top_failing, "scripts", "total", False),
+    "flaky_summary": (run_flaky_summary, None, "total_flaky", True),
+    "build_comparison": (run_build_comparison, "changed_tests", "total_changed", True),
+}
+
+def run_summary_request(summary_type: str, param) -> dict:
+    """
+    Run a detected summary request and shape it like a query result for display.
+    Returns: result dict stored in st.session_state.result
+    """
+    handler, data_key, count_key, is_summary = _SUMMARY_HANDLERS[summary_type]
+    summary_result, query_label = handler(param)
     
-    # Build comparison detection
-    comparison_patterns = [
-        r"compare\s+builds?\s+(\d+)\s+(?:and|vs|with)\s+(\d+)",
-        r"compare\s+builds?\s+(\d+)\s*,\s*(\d+)",
-        r"compare\s+executions?\s+(\d+)\s+(?:and|vs|with)\s+(\d+)",
-        r"compare\s+executions?\s+(\d+)\s*,\s*(\d+)",
-        r"builds?\s+(\d+)\s+(?:and|vs|with)\s+builds?\s+(\d+)",
-        r"executions?\s+(\d+)\s+(?:and|vs|with)\s+executions?\s+(\d+)",
-        r"compare\s+build\s+(\d+)\s+vs\s+(\d+)",
-        r"compare\s+execution\s+(\d+)\s+vs\s+(\d+)",
-        r"build\s+(\d+)\s+vs\s+build\s+(\d+)",
-        r"execution\s+(\d+)\s+vs\s+execution\s+(\d+)",
-        r"compare\s+build",
-        r"compare\s+execution",
-        r"compare\s+builds?",
-        r"build\s+comparison",
-        r"compare\s+yesterday\s+vs\s+today",
-        r"yesterday\s+vs\s+today",
-        r"compare\s+previous\s+vs\s+current",
-        r"previous\s+build\s+vs\s+current",
-        r"last\s+build\s+vs\s+current"
-    ]
-    for pattern in comparison_patterns:
-        match = re.search(pattern, query_lower)
-        if match:
-            if len(match.groups()) == 2:
-                # Two execution numbers specified
-                return ("build_comparison", (match.group(1), match.group(2)))
-            else:
-                # Time-based or implicit comparison
-                return ("build_comparison", None)
+    if summary_result["success"]:
+        return {
+            "query": query_label,
+            "success": True,
+            "data": summary_result.get(data_key, []) if data_key else None,
+            "error": None,
+            "attempts": 1,
+            "row_count": summary_result.get(count_key, 0),
+            "summary": summary_result.get("summary"),
+            "is_summary": is_summary
+        }
     
-    return (None, None)
+    default_error = "Failed to generate summary" if is_summary else "Failed to generate query"
+    return {
+        "query": query_label,
+        "success": False,
+        "data": None,
+        "error": summary_result.get("error", default_error),
+        "attempts": 1,
+        "row_count": 0,
+        "is_summary": is_summary
+    }
 
 # Use configuration from environment variables
 execution_number = config.DEFAULT_EXECUTION_NUMBER
 if generate_button and user_query.strip():
     # Check if this is a summary request
-    summary_type, param = detect_summary_request(user_query)
+    # Stripped so reruns with stray whitespace still hit the detection cache
+    summary_type, param = detect_summary_request(user_query.strip())
     
     if summary_type:
         with st.spinner(f"Generating summary..."):
-            if summary_type == "build_summary":
-                summary_result = SummaryService.generate_build_summary(param)
-                if summary_result["success"]:
-                    st.session_state.result = {
-                        "query": f"Build Summary for Execution #{summary_result['execution_number']}",
-                        "success": True,
-                        "data": None,
-                        "error": None,
-                        "attempts": 1,
-                        "row_count": summary_result["total_scripts"],
-                        "summary": summary_result["summary"],
-                        "is_summary": True
-                    }
-                else:
-                    st.session_state.result = {
-                        "query": "Build Summary",
-                        "success": False,
-                        "data": None,
-                        "error": summary_result.get("error", "Failed to generate summary"),
-                        "attempts": 1,
-                        "row_count": 0,
-                        "is_summary": True
-                    }
-            elif summary_type == "script_summary":
-                summary_result = SummaryService.generate_script_summary(param)
-                if summary_result["success"]:
-                    st.session_state.result = {
-                        "query": f"Script Summary for {summary_result['script_name']}",
-                        "success": True,
-                        "data": summary_result.get("executions", []),  # Include execution data for table display
-                        "error": None,
-                        "attempts": 1,
-                        "row_count": summary_result["total_executions"],
-                        "summary": summary_result["summary"],
-                        "is_summary": True
-                    }
-                else:
-                    st.session_state.result = {
-                        "query": f"Script Summary for {param}",
-                        "success": False,
-                        "data": None,
-                        "error": summary_result.get("error", "Failed to generate summary"),
-                        "attempts": 1,
-                        "row_count": 0,
-                        "is_summary": True
-                    }
-            elif summary_type == "top_flaky":
-                limit = param if isinstance(param, int) else 10
-                summary_result = SummaryService.generate_top_flaky_scripts(limit)
-                if summary_result["success"]:
-                    st.session_state.result = {
-                        "query": f"Top {limit} Flaky Scripts",
-                        "success": True,
-                        "data": summary_result.get("scripts", []),
-                        "error": None,
-                        "attempts": 1,
-                        "row_count": summary_result.get("total", 0),
-                        "summary": None,
-                        "is_summary": False  # Display as regular table, not summary
-                    }
-                else:
-                    st.session_state.result = {
-                        "query": f"Top {limit} Flaky Scripts",
-                        "success": False,
-                        "data": None,
-                        "error": summary_result.get("error", "Failed to generate query"),
-                        "attempts": 1,
-                        "row_count": 0,
-                        "is_summary": False
-                    }
-            elif summary_type == "top_failing":
-                limit = param if isinstance(param, int) else 10
-                summary_result = SummaryService.generate_top_failing_scripts(limit)
-                if summary_result["success"]:
-                    st.session_state.result = {
-                        "query": f"Top {limit} Failing Scripts",
-                        "success": True,
-                        "data": summary_result.get("scripts", []),
-                        "error": None,
-                        "attempts": 1,
-                        "row_count": summary_result.get("total", 0),
-                        "summary": None,
-                        "is_summary": False  # Display as regular table, not summary
-                    }
-                else:
-                    st.session_state.result = {
-                        "query": f"Top {limit} Failing Scripts",
-                        "success": False,
-                        "data": None,
-                        "error": summary_result.get("error", "Failed to generate query"),
-                        "attempts": 1,
-                        "row_count": 0,
-                        "is_summary": False
-                    }
-            elif summary_type == "flaky_summary":
-                summary_result = SummaryService.generate_flaky_scripts_summary()
-                if summary_result["success"]:
-                    st.session_state.result = {
-                        "query": "Flaky Scripts Summary",
-                        "success": True,
-                        "data": None,
-                        "error": None,
-                        "attempts": 1,
-                        "row_count": summary_result["total_flaky"],
-                        "summary": summary_result["summary"],
-                        "is_summary": True
-                    }
-                else:
-                    st.session_state.result = {
-                        "query": "Flaky Scripts Summary",
-                        "success": False,
-                        "data": None,
-                        "error": summary_result.get("error", "Failed to generate summary"),
-                        "attempts": 1,
-                        "row_count": 0,
-                        "is_summary": True
-                    }
-            elif summary_type == "build_comparison":
-                # Handle build comparison
-                exec1, exec2 = None, None
-                if param and isinstance(param, tuple) and len(param) == 2:
-                    exec1, exec2 = param
-                elif param is None:
-                    # Time-based or implicit comparison
-                    exec1, exec2 = None, None
-                
-                summary_result = SummaryService.generate_build_comparison_summary(exec1, exec2)
-                if summary_result["success"]:
-                    st.session_state.result = {
-                        "query": f"Build Comparison: {summary_result['execution1']} vs {summary_result['execution2']}",
-                        "success": True,
-                        "data": summary_result.get("changed_tests", []),  # Include test data for table display
-                        "error": None,
-                        "attempts": 1,
-                        "row_count": summary_result["total_changed"],
-                        "summary": summary_result["summary"],
-                        "is_summary": True
-                    }
-                else:
-                    st.session_state.result = {
-                        "query": "Build Comparison",
-                        "success": False,
-                        "data": None,
-                        "error": summary_result.get("error", "Failed to generate summary"),
-                        "attempts": 1,
-                        "row_count": 0,
-                        "is_summary": True
-                    }
+            st.session_state.result = run_summary_request(summary_type, param)
     else:
         # Regular query generation with summary
         with st.spinner(f"Generating query and summary..."):
@@ -378,191 +310,70 @@ if generate_button and user_query.strip():
 # Display results - flux query and table
 if st.session_state.result:
     result = st.session_state.result
+    # Bind the fields read below once
+    success = result["success"]
+    data = result.get("data")
+    summary_text = result.get("summary")
+    row_count = result.get("row_count")
+    query_str = result.get("query", "")
+    error = result.get("error")
+    is_build_comparison = "Build Comparison" in query_str
     
     # Check if this is a summary result
     if result.get("is_summary"):
         st.markdown("---")
-        if result.get("summary"):
+        if summary_text:
             st.markdown("### 📊 Summary")
             # Display summary - Streamlit markdown supports markdown syntax
-            st.markdown(result["summary"])
+            st.markdown(summary_text)
         
         # Display table if data is available (for build comparison and script summary)
-        if result.get("data") and len(result.get("data", [])) > 0:
+        if data:
             # Determine table title based on query type
-            if "Build Comparison" in result.get("query", ""):
+            if is_build_comparison:
                 st.markdown("### 📋 Changed Tests Table")
             else:
                 st.markdown("### 📋 Test Execution History")
             
-            try:
-                import pandas as pd
-                df = pd.DataFrame(result["data"])
-                
-                # Deduplicate testnames for non-build-comparison queries
-                is_build_comparison = "Build Comparison" in result.get("query", "")
-                if not is_build_comparison and "testname" in df.columns:
-                    # Check if there are duplicate testnames
-                    if df["testname"].duplicated().any():
-                        # Build aggregation dictionary for non-testname columns
-                        agg_dict = {}
-                        for col in df.columns:
-                            if col == "testname":
-                                continue
-                            elif df[col].dtype in ['int64', 'float64', 'int32', 'float32']:
-                                # For numeric columns, take max
-                                agg_dict[col] = 'max'
-                            else:
-                                # For string/object columns, take first
-                                agg_dict[col] = 'first'
-                        
-                        # If agg_dict is empty (only testname column exists), use drop_duplicates
-                        original_count = len(df)
-                        if not agg_dict:
-                            # Only testname column - just remove duplicates
-                            df = df.drop_duplicates(subset=["testname"], keep='first')
-                        else:
-                            # Group by testname and aggregate
-                            df = df.groupby("testname", as_index=False).agg(agg_dict)
-                        
-                        # Add count column to show occurrences
-                        if len(df) < original_count:
-                            original_df = pd.DataFrame(result["data"])
-                            counts = original_df["testname"].value_counts().to_dict()
-                            df["occurrence_count"] = df["testname"].map(counts)
-                
-                # Prioritize columns based on query type
-                if is_build_comparison:
-                    priority_columns = ["testname", "previous_status", "current_status", "current_failure_stack"]
-                else:
-                    # For script summary
-                    priority_columns = ["_time", "testname", "status", "execution_number", "owner", "failure_stack", "occurrence_count"]
-                
-                existing_priority = [col for col in priority_columns if col in df.columns]
-                other_columns = [col for col in df.columns if col not in priority_columns]
-                ordered_columns = existing_priority + sorted(other_columns)
-                
-                df_display = df[ordered_columns] if ordered_columns else df
-                st.dataframe(df_display, use_container_width=True, height=400)
-                
-                # Show appropriate row count message
-                if is_build_comparison:
-                    st.info(f"Total changed tests: {result.get('row_count', len(result['data']))}")
-                else:
-                    deduplicated_count = len(df)
-                    original_count = result.get('row_count', len(result['data']))
-                    if deduplicated_count < original_count:
-                        st.info(f"Total: {deduplicated_count} unique testnames (from {original_count} total rows)")
-                    else:
-                        st.info(f"Total executions: {original_count}")
-            except Exception as e:
-                st.error(f"Error displaying table: {str(e)}")
-                with st.expander("View Raw Data"):
-                    st.json(result["data"][:10] if len(result["data"]) > 10 else result["data"])
+            # Deduplicate testnames for non-build-comparison queries
+            if is_build_comparison:
+                render_results_table(result, _COMPARISON_PRIORITY_COLUMNS, "Total changed tests", deduplicate=False)
+            else:
+                # For script summary
+                render_results_table(result, _SCRIPT_PRIORITY_COLUMNS, "Total executions")
         
-        elif result["success"]:
+        elif success:
             st.info("✅ Summary generated successfully but no summary text available.")
-            if result.get("row_count") is not None:
-                st.info(f"Processed {result['row_count']} items.")
+            if row_count is not None:
+                st.info(f"Processed {row_count} items.")
         else:
-            error_msg = result.get('error', 'Failed to generate summary')
+            error_msg = error or 'Failed to generate summary'
             st.error(f"**❌ Error:** {error_msg}")
-            if result.get("query"):
-                st.info(f"Query attempted: {result['query']}")
+            if query_str:
+                st.info(f"Query attempted: {query_str}")
     else:
         # Regular query results - Display Summary first, then Table
-        if result["success"]:
+        if success:
             # Display Summary first if available
-            if result.get("summary"):
+            if summary_text:
                 st.markdown("---")
                 st.markdown("### 📊 Summary")
-                st.markdown(result["summary"])
+                st.markdown(summary_text)
             
             # Display Table with Results
-            if result.get("data") is not None:
-                if result["row_count"] > 0:
+            if data is not None:
+                if row_count > 0:
                     st.markdown("### 📋 Query Results")
-                    try:
-                        df = pd.DataFrame(result["data"])
-                        
-                        # Deduplicate testnames if they exist
-                        if "testname" in df.columns:
-                            # Check if there are duplicate testnames
-                            if df["testname"].duplicated().any():
-                                # Build aggregation dictionary for non-testname columns
-                                agg_dict = {}
-                                for col in df.columns:
-                                    if col == "testname":
-                                        continue
-                                    elif df[col].dtype in ['int64', 'float64', 'int32', 'float32']:
-                                        # For numeric columns, take max (useful for counts, scores, durations)
-                                        agg_dict[col] = 'max'
-                                    else:
-                                        # For string/object columns, take first
-                                        agg_dict[col] = 'first'
-                                
-                                # If agg_dict is empty (only testname column exists), use drop_duplicates
-                                if not agg_dict:
-                                    # Only testname column - just remove duplicates
-                                    original_count = len(df)
-                                    df = df.drop_duplicates(subset=["testname"], keep='first')
-                                    # Add count column to show occurrences
-                                    if len(df) < original_count:
-                                        original_df = pd.DataFrame(result["data"])
-                                        counts = original_df["testname"].value_counts().to_dict()
-                                        df["occurrence_count"] = df["testname"].map(counts)
-                                else:
-                                    # Group by testname and aggregate
-                                    original_count = len(df)
-                                    df = df.groupby("testname", as_index=False).agg(agg_dict)
-                                    
-                                    # Add count column to show how many times each testname appeared
-                                    if len(df) < original_count:
-                                        # Count occurrences of each testname in original data
-                                        original_df = pd.DataFrame(result["data"])
-                                        counts = original_df["testname"].value_counts().to_dict()
-                                        df["occurrence_count"] = df["testname"].map(counts)
-                        
-                        # Display all columns that are actually in the data
-                        # Prioritize common columns first, then show all others
-                        priority_columns = ["testname", "status", "previous_status", "current_status", 
-                                          "duration", "owner", "failure_stack", "current_failure_stack", 
-                                          "occurrence_count"]
-                        
-                        # Get priority columns that exist in the dataframe
-                        existing_priority = [col for col in priority_columns if col in df.columns]
-                        
-                        # Get all other columns not in priority list
-                        other_columns = [col for col in df.columns if col not in priority_columns]
-                        
-                        # Combine: priority columns first, then others
-                        ordered_columns = existing_priority + sorted(other_columns)
-                        
-                        # Select columns in the desired order
-                        df_display = df[ordered_columns] if ordered_columns else df
-                        
-                        # Display the table with all available columns
-                        st.dataframe(df_display, use_container_width=True, height=400)
-                        
-                        # Show row count (original vs deduplicated)
-                        original_count = result['row_count']
-                        deduplicated_count = len(df)
-                        if original_count > deduplicated_count:
-                            st.info(f"Total rows: {deduplicated_count} unique testnames (from {original_count} total rows)")
-                        else:
-                            st.info(f"Total rows: {result['row_count']}")
-                    except Exception as e:
-                        st.error(f"Error displaying table: {str(e)}")
-                        # Show raw data if DataFrame creation fails
-                        with st.expander("View Raw Data"):
-                            st.json(result["data"][:10] if len(result["data"]) > 10 else result["data"])
+                    # Display all columns that are actually in the data
+                    # Prioritize common columns first, then show all others
+                    render_results_table(result, _QUERY_PRIORITY_COLUMNS, "Total rows", unique_label="Total rows")
                 else:
                     st.info("✓ Query executed successfully but returned no data.")
             else:
                 st.warning("Query executed but no data was returned.")
         else:
             # Query failed
-            if result.get("error"):
-                st.error(f"**Query Error:** {result['error']}")
+            if error:
+                st.error(f"**Query Error:** {error}")
             else:
                 st.error("Query execution failed.")
@@ -2,9 +2,11 @@
 Client factory module using Factory pattern.
 Creates and manages client instances for external services.
 """
+import httpx
 import streamlit as st
-from openai import OpenAI
-from influxdb_client import InfluxDBClient
+from openai import DEFAULT_TIMEOUT, OpenAI
+from influxdb_client import InfluxDBClient, QueryApi
+from urllib3 import Retry
 from config import config
 
 
@@ -21,7 +23,16 @@ class ClientFactory:
         Create and cache OpenAI client instance.
         Uses Streamlit's cache_resource for efficient resource management.
         """
-        return OpenAI(api_key=config.OPENAI_API_KEY)
+        # One HTTP/2 keep-alive client, so repeated chat calls reuse the same
+        # TLS connection instead of handshaking again. Sized for several sessions
+        # each running up to three speculative candidates at once.
+        http_client = httpx.Client(
+            http2=True,
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+            follow_redirects=True
+        )
+        return OpenAI(api_key=config.OPENAI_API_KEY, http_client=http_client)
     
     @staticmethod
     @st.cache_resource
@@ -34,13 +45,31 @@ class ClientFactory:
             InfluxDBClient instance or None if connection fails
         """
         try:
+            # Flux responses are CSV text and compress well, so gzip cuts the bytes
+            # on the wire; the cached client keeps its pooled connections warm
             client = InfluxDBClient(
                 url=config.INFLUX_URL,
                 token=config.INFLUX_TOKEN,
-                org=config.INFLUX_ORG
+                org=config.INFLUX_ORG,
+                enable_gzip=True,
+                connection_pool_maxsize=16,
+                retries=Retry(total=3, backoff_factor=0.1)
             )
             return client
         except Exception as e:
             st.error(f"Failed to connect to InfluxDB: {str(e)}")
             return None
+    
+    @staticmethod
+    @st.cache_resource
+    def get_influx_query_api() -> QueryApi:
+        """
+        Create and cache the query API of the cached InfluxDB client.
+        Shared by all queries so it isn't rebuilt on every call.
+        
+        Returns:
+            QueryApi instance or None if the client could not be created
+        """
+        client = ClientFactory.get_influx_client()
+        return client.query_api() if client else None
 
@@ -1,51 +1,55 @@
 """
-Configuration management module using Singleton pattern.
+Configuration management module using a cached factory.
 Centralizes all configuration loading from environment variables.
 """
+import functools
 import os
+from dataclasses import dataclass, field
 from typing import Optional
 from dotenv import load_dotenv
 
 
+@dataclass(frozen=True)
 class Config:
     """
-    Singleton configuration class for managing application settings.
+    Immutable application settings, built once per process by get_config().
     Uses environment variables with fallback to default values.
     """
-    _instance: Optional['Config'] = None
-    _initialized: bool = False
+    # OpenAI Configuration (secrets are kept out of the dataclass repr)
+    OPENAI_API_KEY: Optional[str] = field(repr=False)
+    
+    # InfluxDB Configuration
+    INFLUX_URL: Optional[str]
+    INFLUX_TOKEN: Optional[str] = field(repr=False)
+    INFLUX_ORG: str
+    INFLUX_BUCKET: str
+    
+    # Application Configuration
+    DEFAULT_EXECUTION_NUMBER: str
+    MAX_RETRIES: int
+    OPENAI_MODEL: str
+    # Parallel candidates for the first generation attempt (1 disables speculation)
+    SPECULATIVE_CANDIDATES: int
+    # Backoff between generation retries after an API error, in seconds
+    RETRY_BASE_DELAY: float
+    RETRY_MAX_DELAY: float
+    RETRY_JITTER: float
+    
+    # validate() result; the fields never change, so it is computed once at construction
+    _validation: tuple[bool, Optional[str]] = field(init=False, repr=False, compare=False)
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(Config, cls).__new__(cls)
-        return cls._instance
-
-    def __init__(self):
-        if not self._initialized:
-            # Load environment variables from .env file
-            load_dotenv()
-            
-            # OpenAI Configuration
-            self.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-            
-            # InfluxDB Configuration
-            self.INFLUX_URL = os.getenv("INFLUX_URL")
-            self.INFLUX_TOKEN = os.getenv("INFLUX_TOKEN")
-            self.INFLUX_ORG = os.getenv("INFLUX_ORG", "myorg")
-            self.INFLUX_BUCKET = os.getenv("INFLUX_BUCKET", "testexecution")
-            
-            # Application Configuration
-            self.DEFAULT_EXECUTION_NUMBER = os.getenv("DEFAULT_EXECUTION_NUMBER", "1")
-            self.MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
-            self.OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-            
-            Config._initialized = True
+    def __post_init__(self):
+        object.__setattr__(self, "_validation", self._check_required())
 
     def validate(self) -> tuple[bool, Optional[str]]:
         """
         Validate that all required configuration values are present.
         Returns (is_valid, error_message).
         """
+        return self._validation
+
+    def _check_required(self) -> tuple[bool, Optional[str]]:
+        """Check the required settings for missing or placeholder values."""
         if not self.OPENAI_API_KEY or self.OPENAI_API_KEY.startswith("your_"):
             return False, "OPENAI_API_KEY is not set or is using placeholder value"
         
@@ -61,6 +65,36 @@ class Config:
         return True, None
 
 
-# Global configuration instance
-config = Config()
+@functools.cache
+def get_config() -> Config:
+    """
+    Build the application configuration on first call and return the same instance afterwards.
+    The .env file is parsed only once, and the environment is read from a single snapshot.
+    """
+    load_dotenv(override=False)
+    env = dict(os.environ)
+    return Config(
+        OPENAI_API_KEY=env.get("OPENAI_API_KEY"),
+        INFLUX_URL=env.get("INFLUX_URL"),
+        INFLUX_TOKEN=env.get("INFLUX_TOKEN"),
+        INFLUX_ORG=env.get("INFLUX_ORG", "myorg"),
+        INFLUX_BUCKET=env.get("INFLUX_BUCKET", "testexecution"),
+        DEFAULT_EXECUTION_NUMBER=env.get("DEFAULT_EXECUTION_NUMBER", "1"),
+        MAX_RETRIES=int(env.get("MAX_RETRIES", "3")),
+        OPENAI_MODEL=env.get("OPENAI_MODEL", "gpt-4o-mini"),
+        SPECULATIVE_CANDIDATES=int(env.get("SPECULATIVE_CANDIDATES", "1")),
+        RETRY_BASE_DELAY=float(env.get("RETRY_BASE_DELAY", "1.0")),
+        RETRY_MAX_DELAY=float(env.get("RETRY_MAX_DELAY", "30.0")),
+        RETRY_JITTER=float(env.get("RETRY_JITTER", "0.5"))
+    )
+
+
+def __getattr__(name: str):
+    """
+    Provide the global `config` instance lazily (PEP 562).
+    Importing the module does no file I/O; the .env file is read on first access.
+    """
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
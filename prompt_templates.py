@@ -2,6 +2,15 @@
 Specialized prompt templates for different query types.
 Each prompt is optimized for its specific query category.
 """
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
 
 # Base schema information (shared across all prompts)
 BASE_SCHEMA = """
@@ -23,14 +32,19 @@ RULES:
 5. Default time: 1970-01-01T00:00:00Z. Execution number: only if mentioned, else query all.
 """
 
+# Shared preamble, identical across every request; sent as its own system
+# message it forms a stable prefix that OpenAI's prompt caching can reuse.
+# Not wired in yet: nothing calls get_messages_for_query, and services.py
+# still sends its own QUERY_ANALYSIS_PROMPT
+SYSTEM_PREAMBLE = BASE_SCHEMA + "\n\n" + CORE_RULES
 
-def get_simple_query_prompt() -> str:
-    """Prompt for simple queries: list, count, filter, show"""
-    return f"""{BASE_SCHEMA}
+# Preamble of the single-string prompts below, joined once and shared by all of them
+_PREAMBLE = SYSTEM_PREAMBLE + "\n\n"
 
-{CORE_RULES}
 
-TASK: Generate Flux query for simple data retrieval.
+# Task-specific instructions; each prompt is the shared preamble plus one of these.
+# Prompts are built once at import; each getter returns its prebuilt string
+_SIMPLE_TASK = """TASK: Generate Flux query for simple data retrieval.
 
 QUERY TYPES: list, show, display, count, filter, get
 BASE: from(bucket: "testexecution") |> range(start: 1970-01-01T00:00:00Z) |> filter(fn: (r) => r._measurement == "testmethod")
@@ -44,15 +58,15 @@ OUTPUT FORMATS:
 
 OUTPUT: Flux query only, no markdown/comments.
 """
+_SIMPLE_QUERY_PROMPT = _PREAMBLE + _SIMPLE_TASK
 
 
-def get_comparison_query_prompt() -> str:
-    """Prompt for build comparison queries"""
-    return f"""{BASE_SCHEMA}
+def get_simple_query_prompt() -> str:
+    """Prompt for simple queries: list, count, filter, show"""
+    return _SIMPLE_QUERY_PROMPT
 
-{CORE_RULES}
 
-TASK: Generate Flux query for build/execution comparison.
+_COMPARISON_TASK = """TASK: Generate Flux query for build/execution comparison.
 
 PATTERN: Two queries (build1/build2), pivot both, group(columns: ["testname"]), rename status columns, join.
 
@@ -64,7 +78,7 @@ build1 = from(bucket: "testexecution")
   |> filter(fn: (r) => r._field == "duration")
   |> pivot(rowKey: ["testname"], columnKey: ["_field"], valueColumn: "_value")
   |> group(columns: ["testname"])
-  |> rename(columns: {{status: "previous_status"}})
+  |> rename(columns: {status: "previous_status"})
 
 build2 = from(bucket: "testexecution")
   |> range(start: 1970-01-01T00:00:00Z)
@@ -73,9 +87,9 @@ build2 = from(bucket: "testexecution")
   |> filter(fn: (r) => r._field == "duration")
   |> pivot(rowKey: ["testname"], columnKey: ["_field"], valueColumn: "_value")
   |> group(columns: ["testname"])
-  |> rename(columns: {{status: "current_status"}})
+  |> rename(columns: {status: "current_status"})
 
-join(tables: {{b1: build1, b2: build2}}, on: ["testname"])
+join(tables: {b1: build1, b2: build2}, on: ["testname"])
   |> filter(fn: (r) => r.previous_status == "PASS" and (r.current_status == "FAIL" or r.current_status == "SKIP"))
   |> keep(columns: ["testname", "previous_status", "current_status"])
   |> group()
@@ -84,84 +98,84 @@ IMPORTANT: Use only duration field (not failure_stack) to avoid field size limit
 
 OUTPUT: Flux query only, no markdown/comments.
 """
+_COMPARISON_QUERY_PROMPT = _PREAMBLE + _COMPARISON_TASK
 
 
-def get_flaky_query_prompt() -> str:
-    """Prompt for flaky test detection queries"""
-    return f"""{BASE_SCHEMA}
+def get_comparison_query_prompt() -> str:
+    """Prompt for build comparison queries"""
+    return _COMPARISON_QUERY_PROMPT
 
-{CORE_RULES}
 
-TASK: Generate Flux query for flaky test detection (tests with both PASS and FAIL).
+_FLAKY_TASK = """TASK: Generate Flux query for flaky test detection (tests with both PASS and FAIL).
 
 PATTERN:
 filter(fn: (r) => r._field == "duration")
 |> group(columns: ["testname"])
 |> reduce(
-    identity: {{pass: 0, fail: 0, total: 0}},
-    fn: (r, acc) => ({{
+    identity: {pass: 0, fail: 0, total: 0},
+    fn: (r, acc) => ({
         pass: acc.pass + (if r.status == "PASS" then 1 else 0),
         fail: acc.fail + (if r.status == "FAIL" then 1 else 0),
         total: acc.total + 1
-    }})
+    })
 )
 |> filter(fn: (r) => r.pass > 0 and r.fail > 0)
-|> map(fn: (r) => ({{
+|> map(fn: (r) => ({
     testname: r.testname,
     pass_count: r.pass,
     fail_count: r.fail,
     flakiness_score: float(v: r.fail) / float(v: r.total)
-}}))
+}))
 |> sort(columns: ["flakiness_score"], desc: true)
 
 Add filters for owner, environment, time range as needed. NO execution_number filter (historical analysis).
 
 OUTPUT: Flux query only, no markdown/comments.
 """
+_FLAKY_QUERY_PROMPT = _PREAMBLE + _FLAKY_TASK
 
 
-def get_statistics_query_prompt() -> str:
-    """Prompt for statistics/performance queries"""
-    return f"""{BASE_SCHEMA}
+def get_flaky_query_prompt() -> str:
+    """Prompt for flaky test detection queries"""
+    return _FLAKY_QUERY_PROMPT
 
-{CORE_RULES}
 
-TASK: Generate Flux query for statistics/performance metrics (min, max, avg, count).
+_STATISTICS_TASK = """TASK: Generate Flux query for statistics/performance metrics (min, max, avg, count).
 
 PATTERN:
 filter(fn: (r) => r._field == "duration")
 |> group(columns: ["testname"])
 |> reduce(
-    identity: {{min: 999999.0, max: 0.0, sum: 0.0, count: 0}},
-    fn: (r, acc) => ({{
+    identity: {min: 999999.0, max: 0.0, sum: 0.0, count: 0},
+    fn: (r, acc) => ({
         min: if r._value < acc.min then r._value else acc.min,
         max: if r._value > acc.max then r._value else acc.max,
         sum: acc.sum + r._value,
         count: acc.count + 1
-    }})
+    })
 )
-|> map(fn: (r) => ({{
+|> map(fn: (r) => ({
     testname: r.testname,
     min_duration: r.min,
     max_duration: r.max,
     avg_duration: r.sum / float(v: r.count),
     execution_count: r.count
-}}))
+}))
 |> sort(columns: ["avg_duration"], desc: true)
 
 Add filters for owner, environment, time range as needed.
 
 OUTPUT: Flux query only, no markdown/comments.
 """
+_STATISTICS_QUERY_PROMPT = _PREAMBLE + _STATISTICS_TASK
 
 
-def get_complex_query_prompt() -> str:
-    """Prompt for complex/analytical queries"""
-    return f"""{BASE_SCHEMA}
+def get_statistics_query_prompt() -> str:
+    """Prompt for statistics/performance queries"""
+    return _STATISTICS_QUERY_PROMPT
 
-{CORE_RULES}
 
-TASK: Generate Flux query for complex analytical queries. Be creative and flexible.
+_COMPLEX_TASK = """TASK: Generate Flux query for complex analytical queries. Be creative and flexible.
 
 APPROACH:
 1. BASE: from(bucket: "testexecution") |> range(start: 1970-01-01T00:00:00Z) |> filter(fn: (r) => r._measurement == "testmethod")
@@ -173,6 +187,48 @@ ERROR FIXES: Schema collision → _field filter before pivot. Column not found 
 
 OUTPUT: Flux query only, no markdown/comments. If unsupported: ERROR: Query not supported.
 """
+_COMPLEX_QUERY_PROMPT = _PREAMBLE + _COMPLEX_TASK
+
+
+def get_complex_query_prompt() -> str:
+    """Prompt for complex/analytical queries"""
+    return _COMPLEX_QUERY_PROMPT
+
+
+# Query type -> prebuilt prompt, used by get_prompt_for_query
+_PROMPT_MAP = {
+    "simple": _SIMPLE_QUERY_PROMPT,
+    "comparison": _COMPARISON_QUERY_PROMPT,
+    "flaky": _FLAKY_QUERY_PROMPT,
+    "statistics": _STATISTICS_QUERY_PROMPT,
+    "complex": _COMPLEX_QUERY_PROMPT
+}
+
+# Query type -> task-specific instructions, sent after SYSTEM_PREAMBLE
+TASK_SUFFIX_MAP = {
+    "simple": _SIMPLE_TASK,
+    "comparison": _COMPARISON_TASK,
+    "flaky": _FLAKY_TASK,
+    "statistics": _STATISTICS_TASK,
+    "complex": _COMPLEX_TASK
+}
+
+
+# Query type keywords in priority order, each list compiled into one regex so
+# a category is decided in a single scan (plain substring matches, as before)
+_QUERY_TYPE_KEYWORDS = tuple(
+    (query_type, re.compile("|".join(re.escape(keyword) for keyword in keywords)))
+    for query_type, keywords in (
+        # Comparison queries
+        ("comparison", ["compare", "vs", "versus", "difference", "changed", "yesterday vs today"]),
+        # Flaky queries
+        ("flaky", ["flaky", "unstable", "inconsistent", "intermittent"]),
+        # Statistics/performance queries
+        ("statistics", ["performance", "metrics", "statistics", "stats", "min", "max", "avg", "average", "summary"]),
+        # Simple queries (list, count, show, filter)
+        ("simple", ["list", "show", "display", "count", "how many", "get", "filter"]),
+    )
+)
 
 
 def classify_query_type(user_query: str) -> str:
@@ -183,23 +239,11 @@ def classify_query_type(user_query: str) -> str:
     """
     query_lower = user_query.lower()
     
-    # Comparison queries
-    if any(keyword in query_lower for keyword in ["compare", "vs", "versus", "difference", "changed", "yesterday vs today"]):
-        return "comparison"
-    
-    # Flaky queries
-    if any(keyword in query_lower for keyword in ["flaky", "unstable", "inconsistent", "intermittent"]):
-        return "flaky"
+    # First category whose keyword scan matches wins; default to complex for anything else
+    for query_type, keyword_rx in _QUERY_TYPE_KEYWORDS:
+        if keyword_rx.search(query_lower):
+            return query_type
     
-    # Statistics/performance queries
-    if any(keyword in query_lower for keyword in ["performance", "metrics", "statistics", "stats", "min", "max", "avg", "average", "summary"]):
-        return "statistics"
-    
-    # Simple queries (list, count, show, filter)
-    if any(keyword in query_lower for keyword in ["list", "show", "display", "count", "how many", "get", "filter"]):
-        return "simple"
-    
-    # Default to complex for anything else
     return "complex"
 
 
@@ -214,14 +258,158 @@ def get_prompt_for_query(user_query: str) -> str:
         Appropriate system prompt string
     """
     query_type = classify_query_type(user_query)
+    return _PROMPT_MAP.get(query_type, _COMPLEX_QUERY_PROMPT)
+
+
+def get_messages_for_query(user_query: str) -> list:
+    """
+    Get chat messages for the query with the shared preamble as a fixed prefix.
+    
+    Args:
+        user_query: The user's natural language query
+        
+    Returns:
+        Chat messages: the shared preamble, the task-specific instructions, then the user query
+    """
+    query_type = classify_query_type(user_query)
+    return [
+        {"role": "system", "content": SYSTEM_PREAMBLE},
+        {"role": "system", "content": TASK_SUFFIX_MAP.get(query_type, _COMPLEX_TASK)},
+        {"role": "user", "content": user_query}
+    ]
+
+
+@lru_cache(maxsize=16)
+def _prompt_digest(system_prompt: str) -> str:
+    """Short stable hash of a system prompt, used as the prompt part of cache keys."""
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class QuerySkeletonCache:
+    """
+    LRU cache of generated Flux queries keyed by a normalized form of the user query.
+    Repeated questions skip prompt construction and the LLM call entirely.
+    When given a path, entries are saved to a JSON file so they survive restarts.
+    """
+    
+    # Whitespace runs and trailing punctuation don't change what is being asked
+    _WHITESPACE_RX = re.compile(r"\s+")
+    _TRAILING_PUNCTUATION = "?!. "
+    
+    def __init__(self, maxsize: int = 1024, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = Path(path) if path else None
+        self._entries: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        # The file is read on first use rather than at import time
+        self._loaded = self.path is None
+    
+    @classmethod
+    def skeletonize(cls, user_query: str) -> str:
+        """
+        Normalize a user query into its cache key.
+        
+        Numbers and names are kept as typed: "build 3573" and "build 3574" need
+        different Flux queries, and tag values are case-sensitive, so "LoginPageTest"
+        and "loginpagetest" do too. Only spacing and trailing punctuation are dropped.
+        """
+        return cls._WHITESPACE_RX.sub(" ", user_query).strip(cls._TRAILING_PUNCTUATION)
+    
+    @classmethod
+    def _key(cls, user_query: str, system_prompt: str) -> tuple:
+        """Cache key; a changed schema/prompt gives a different key, so stale queries are never served."""
+        return (_prompt_digest(system_prompt), cls.skeletonize(user_query))
     
-    prompt_map = {
-        "simple": get_simple_query_prompt(),
-        "comparison": get_comparison_query_prompt(),
-        "flaky": get_flaky_query_prompt(),
-        "statistics": get_statistics_query_prompt(),
-        "complex": get_complex_query_prompt()
-    }
+    def _load(self):
+        """Read saved entries from the cache file. Caller holds the lock."""
+        self._loaded = True
+        if not self.path.exists():
+            return
+        try:
+            saved = json.loads(self.path.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Error reading query cache file: {e}")
+            return
+        # Entries are saved oldest first, so the LRU order carries over
+        for digest, skeleton, flux_query in saved[-self.maxsize:]:
+            self._entries[(digest, skeleton)] = flux_query
     
-    return prompt_map.get(query_type, get_complex_query_prompt())
+    def _save(self):
+        """Write the entries to the cache file. Caller holds the lock."""
+        # Written to a temp file and renamed over, so a crash mid-write keeps the old cache
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            tmp_path.write_text(
+                json.dumps([[*key, flux_query] for key, flux_query in self._entries.items()]),
+                encoding="utf-8"
+            )
+            os.replace(tmp_path, self.path)
+        except IOError as e:
+            print(f"Error writing query cache file: {e}")
+    
+    def get(self, user_query: str, system_prompt: str) -> Optional[str]:
+        """
+        Return the cached Flux query for user_query, or None on a miss.
+        
+        Args:
+            user_query: The user's natural language query
+            system_prompt: Prompt the query was generated with
+        """
+        key = self._key(user_query, system_prompt)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            flux_query = self._entries.get(key)
+            if flux_query is not None:
+                self._entries.move_to_end(key)
+            return flux_query
+    
+    def put(self, user_query: str, system_prompt: str, flux_query: str):
+        """Store a Flux query that was generated and validated successfully."""
+        key = self._key(user_query, system_prompt)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._entries[key] = flux_query
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            # Only successful generations are stored, so a rewrite per put is
+            # cheap next to the LLM call that produced the entry
+            if self.path is not None:
+                self._save()
+    
+    def discard(self, user_query: str, system_prompt: str):
+        """Evict the cached query for user_query, e.g. after it stopped executing."""
+        key = self._key(user_query, system_prompt)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if self._entries.pop(key, None) is not None and self.path is not None:
+                self._save()
+    
+    def clear(self):
+        """Drop every cached query."""
+        with self._lock:
+            self._entries.clear()
+            self._loaded = True
+            if self.path is not None:
+                self._save()
+
+
+# Global skeleton cache instance, kept across restarts
+query_skeleton_cache = QuerySkeletonCache(path="flux_query_cache.json")
+
 
+def try_cached(user_query: str, system_prompt: str) -> Optional[str]:
+    """
+    Look up a previously generated Flux query for user_query.
+    
+    Args:
+        user_query: The user's natural language query
+        system_prompt: System prompt the query would be generated with
+        
+    Returns:
+        Cached Flux query, or None if the query has to be generated
+    """
+    return query_skeleton_cache.get(user_query, system_prompt)
@@ -1,22 +1,91 @@
 """
 Query logging service using Singleton pattern.
-Logs user queries and generated Flux queries to a JSON file.
+Logs user queries and generated Flux queries to a JSON Lines file.
 """
+import atexit
 import json
 import os
+import threading
+import time
+from collections import deque
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, NamedTuple, Optional, Union
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
+
+def _dumps(obj) -> bytes:
+    """Serialize obj as one compact JSON line, using orjson's C encoder when available."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+def _loads(data: bytes):
+    """Parse JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class LogEntry(NamedTuple):
+    """
+    One logged query. A tuple instead of an 8-key dict per call;
+    converted to a dict only when written to the file or returned to callers.
+    """
+    # Raw epoch float for new entries, ISO string for entries loaded from the file
+    timestamp: Union[float, str, None]
+    user_query: str
+    flux_query: str
+    execution_number: Optional[str]
+    success: bool
+    row_count: int
+    attempts: int
+    error: Optional[str]
+
+    @classmethod
+    def from_dict(cls, log: dict) -> "LogEntry":
+        """Build an entry from a dict read from the log file, filling in missing keys."""
+        return cls(
+            timestamp=log.get("timestamp"),
+            user_query=log.get("user_query", ""),
+            flux_query=log.get("flux_query", ""),
+            execution_number=log.get("execution_number"),
+            success=log.get("success", False),
+            row_count=log.get("row_count", 0),
+            attempts=log.get("attempts", 1),
+            error=log.get("error")
+        )
+
+    def to_dict(self) -> dict:
+        """Return the entry as a log dict, with the timestamp rendered as an ISO string."""
+        log = self._asdict()
+        if isinstance(self.timestamp, float):
+            log["timestamp"] = datetime.fromtimestamp(self.timestamp).isoformat()
+        return log
+
 
 class QueryLogger:
     """
     Singleton logger class for tracking user queries and Flux queries.
     Implements Observer pattern for query tracking.
+    Entries are appended to a JSON Lines file, one log entry per line.
     """
     _instance: Optional['QueryLogger'] = None
     _initialized: bool = False
-    _log_file: str = "query_logs.json"
+    _log_file: str = "query_logs.jsonl"
+    _legacy_log_file: str = "query_logs.json"
+    _max_entries: int = 1000
+    # Buffered entries are written at least this often, or sooner once this many are waiting
+    _flush_interval: float = 1.0
+    _flush_batch: int = 64
+    # Cap on entries waiting to be written; if the disk stalls, the oldest are dropped
+    _max_buffered: int = 10000
 
     def __new__(cls):
         if cls._instance is None:
@@ -27,33 +96,143 @@ class QueryLogger:
         if not QueryLogger._initialized:
             self.log_file_path = Path(self._log_file)
             self._ensure_log_file_exists()
+            self._line_count = self._count_lines()
+            
+            # The file is read once; afterwards the in-memory window and running
+            # totals are updated per entry and serve every read
+            self._logs = deque(maxlen=self._max_entries)
+            self._successful = 0
+            self._total_attempts = 0
+            self._total_rows = 0
+            # Sequence number the next entry will get; entry seq maps to
+            # self._logs[seq - (self._next_seq - len(self._logs))]
+            self._next_seq = 0
+            # trigram -> sequence numbers of entries containing it; built on the
+            # first search so processes that never search don't pay for it
+            self._trigram_index: Optional[Dict[str, set]] = None
+            for log in self._read_logs():
+                self._remember(LogEntry.from_dict(log))
+            
+            # Entries wait in a buffer and a background thread appends them in
+            # batches; _lock guards the buffer and in-memory state, _write_lock the file
+            self._buffer = deque(maxlen=self._max_buffered)
+            self._lock = threading.Lock()
+            self._write_lock = threading.Lock()
+            self._flush_requested = threading.Event()
+            threading.Thread(target=self._flusher, name="query-logger-flush", daemon=True).start()
+            atexit.register(self.flush)
             QueryLogger._initialized = True
 
     def _ensure_log_file_exists(self):
-        """Create log file if it doesn't exist with empty array structure."""
-        if not self.log_file_path.exists():
-            with open(self.log_file_path, 'w') as f:
-                json.dump([], f, indent=2)
+        """Create log file if it doesn't exist, carrying over entries from the old JSON array file."""
+        if self.log_file_path.exists():
+            return
+        legacy_path = Path(self._legacy_log_file)
+        logs = []
+        if legacy_path.exists() and legacy_path.stat().st_size > 0:
+            try:
+                logs = _loads(legacy_path.read_bytes())[-self._max_entries:]
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"Error reading legacy log file: {e}")
+        self._write_lines([_dumps(log) + b"\n" for log in logs])
 
-    def _read_logs(self) -> list:
-        """Read existing logs from file."""
+    def _count_lines(self) -> int:
+        """Count the entries currently in the log file."""
+        try:
+            with open(self.log_file_path, 'rb') as f:
+                return sum(1 for _ in f)
+        except IOError:
+            return 0
+
+    def _iter_lines(self):
+        """Yield the raw lines of the log file, or nothing if it can't be read."""
         try:
-            if self.log_file_path.exists() and self.log_file_path.stat().st_size > 0:
-                with open(self.log_file_path, 'r') as f:
-                    return json.load(f)
-            return []
-        except (json.JSONDecodeError, IOError) as e:
+            with open(self.log_file_path, 'rb') as f:
+                yield from f
+        except IOError as e:
             print(f"Error reading log file: {e}")
-            return []
 
-    def _write_logs(self, logs: list):
-        """Write logs to file."""
+    @staticmethod
+    def _parse_lines(lines) -> list:
+        """Parse JSON lines into log entries, skipping blank or corrupt lines."""
+        logs = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                logs.append(_loads(line))
+            except json.JSONDecodeError as e:
+                print(f"Error reading log entry: {e}")
+        return logs
+
+    def _read_logs(self) -> list:
+        """Read the most recent logs (up to the entry cap) from file."""
+        return self._parse_lines(deque(self._iter_lines(), maxlen=self._max_entries))
+
+    def _write_lines(self, lines: list):
+        """Replace the log file contents with the given JSON lines."""
+        # Written to a temp file and renamed over the log, so a crash mid-write
+        # leaves the previous file intact instead of a truncated one
+        tmp_path = self.log_file_path.with_suffix(self.log_file_path.suffix + ".tmp")
         try:
-            with open(self.log_file_path, 'w') as f:
-                json.dump(logs, f, indent=2)
+            tmp_path.write_bytes(b"".join(lines))
+            os.replace(tmp_path, self.log_file_path)
         except IOError as e:
             print(f"Error writing to log file: {e}")
 
+    def _remember(self, log: LogEntry):
+        """Add a log entry to the in-memory window, keeping the running totals in step."""
+        if len(self._logs) == self._logs.maxlen:
+            # The oldest entry falls out of the window - drop it from the totals too
+            self._forget(self._logs[0], self._next_seq - len(self._logs))
+        self._logs.append(log)
+        if self._trigram_index is not None:
+            self._index_entry(log, self._next_seq)
+        self._next_seq += 1
+        self._successful += 1 if log.success else 0
+        self._total_attempts += log.attempts
+        self._total_rows += log.row_count
+
+    def _forget(self, log: LogEntry, seq: int):
+        """Subtract a log entry's contribution from the running totals and search index."""
+        if self._trigram_index is not None:
+            for trigram in self._trigrams(self._search_text(log)):
+                seqs = self._trigram_index[trigram]
+                seqs.discard(seq)
+                if not seqs:
+                    del self._trigram_index[trigram]
+        self._successful -= 1 if log.success else 0
+        self._total_attempts -= log.attempts
+        self._total_rows -= log.row_count
+
+    @staticmethod
+    def _search_text(log: LogEntry) -> str:
+        """Lowercased text a search term is matched against."""
+        return f"{log.user_query or ''}\n{log.flux_query or ''}".lower()
+
+    @staticmethod
+    def _trigrams(text: str) -> set:
+        """All three-character substrings of text."""
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def _index_entry(self, log: LogEntry, seq: int):
+        """Add a log entry's trigrams to the search index."""
+        for trigram in self._trigrams(self._search_text(log)):
+            self._trigram_index.setdefault(trigram, set()).add(seq)
+
+    def _build_trigram_index(self):
+        """Index every entry currently in the in-memory window."""
+        self._trigram_index = {}
+        first_seq = self._next_seq - len(self._logs)
+        for offset, log in enumerate(self._logs):
+            self._index_entry(log, first_seq + offset)
+
+    def _rotate(self):
+        """Trim the log file to the most recent entries."""
+        lines = deque(self._iter_lines(), maxlen=self._max_entries)
+        self._write_lines(list(lines))
+        self._line_count = len(lines)
+
     def log_query(
         self,
         user_query: str,
@@ -76,25 +255,52 @@ class QueryLogger:
             error: Error message if query failed
             attempts: Number of attempts made
         """
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "user_query": user_query,
-            "flux_query": flux_query,
-            "execution_number": execution_number,
-            "success": success,
-            "row_count": row_count,
-            "attempts": attempts,
-            "error": error
-        }
+        # time.time() is cheap; formatting waits until the entry is written or read
+        log_entry = LogEntry(
+            time.time(), user_query, flux_query, execution_number,
+            success, row_count, attempts, error
+        )
 
-        logs = self._read_logs()
-        logs.append(log_entry)
-        
-        # Keep only last 1000 entries to prevent file from growing too large
-        if len(logs) > 1000:
-            logs = logs[-1000:]
-        
-        self._write_logs(logs)
+        with self._lock:
+            self._remember(log_entry)
+            self._buffer.append(log_entry)
+            if len(self._buffer) >= self._flush_batch:
+                self._flush_requested.set()
+
+    def _flusher(self):
+        """Background loop writing buffered entries every flush interval."""
+        while True:
+            self._flush_requested.wait(self._flush_interval)
+            self._flush_requested.clear()
+            self._flush_now()
+
+    def flush(self):
+        """Write all buffered entries to the log file now, instead of waiting for the flusher."""
+        self._flush_now()
+
+    def _flush_now(self):
+        """Append every buffered entry to the log file in a single write."""
+        with self._write_lock:
+            with self._lock:
+                if not self._buffer:
+                    return
+                entries = list(self._buffer)
+                self._buffer.clear()
+            
+            # Append lines instead of rewriting the whole file per entry
+            try:
+                with open(self.log_file_path, 'ab') as f:
+                    f.write(b"".join(_dumps(entry.to_dict()) + b"\n" for entry in entries))
+            except IOError as e:
+                print(f"Error writing to log file: {e}")
+                return
+            self._line_count += len(entries)
+            
+            # Keep only last 1000 entries to prevent file from growing too large.
+            # The file may hold up to twice that before it is trimmed, so the
+            # rewrite happens once per 1000 appends rather than on every one.
+            if self._line_count > 2 * self._max_entries:
+                self._rotate()
 
     def get_recent_logs(self, limit: int = 50) -> list:
         """
@@ -106,8 +312,10 @@ class QueryLogger:
         Returns:
             List of recent log entries
         """
-        logs = self._read_logs()
-        return logs[-limit:] if len(logs) > limit else logs
+        with self._lock:
+            logs = list(self._logs)
+        logs = logs[-limit:] if len(logs) > limit else logs
+        return [log.to_dict() for log in logs]
 
     def get_logs_by_query(self, search_term: str) -> list:
         """
@@ -119,12 +327,25 @@ class QueryLogger:
         Returns:
             List of matching log entries
         """
-        logs = self._read_logs()
         search_term_lower = search_term.lower()
+        
+        with self._lock:
+            candidates = list(self._logs)
+            
+            # Terms of three or more characters narrow the scan to entries that
+            # contain every trigram of the term; the substring check below confirms them
+            term_trigrams = self._trigrams(search_term_lower)
+            if term_trigrams:
+                if self._trigram_index is None:
+                    self._build_trigram_index()
+                seq_sets = sorted((self._trigram_index.get(t, set()) for t in term_trigrams), key=len)
+                first_seq = self._next_seq - len(self._logs)
+                candidates = [self._logs[seq - first_seq] for seq in sorted(set.intersection(*seq_sets))]
+        
         return [
-            log for log in logs
-            if search_term_lower in log.get("user_query", "").lower()
-            or search_term_lower in log.get("flux_query", "").lower()
+            log.to_dict() for log in candidates
+            if search_term_lower in (log.user_query or "").lower()
+            or search_term_lower in (log.flux_query or "").lower()
         ]
 
     def get_statistics(self) -> Dict[str, Any]:
@@ -134,8 +355,13 @@ class QueryLogger:
         Returns:
             Dictionary with query statistics
         """
-        logs = self._read_logs()
-        if not logs:
+        with self._lock:
+            total = len(self._logs)
+            successful = self._successful
+            total_attempts = self._total_attempts
+            total_rows = self._total_rows
+        
+        if not total:
             return {
                 "total_queries": 0,
                 "successful_queries": 0,
@@ -145,21 +371,25 @@ class QueryLogger:
                 "total_rows_returned": 0
             }
 
-        successful = sum(1 for log in logs if log.get("success", False))
-        failed = len(logs) - successful
-        total_attempts = sum(log.get("attempts", 1) for log in logs)
-        total_rows = sum(log.get("row_count", 0) for log in logs)
+        # Running totals are kept by log_query, so no pass over the entries is needed
+        failed = total - successful
 
         return {
-            "total_queries": len(logs),
+            "total_queries": total,
             "successful_queries": successful,
             "failed_queries": failed,
-            "success_rate": round(successful / len(logs) * 100, 2) if logs else 0.0,
-            "average_attempts": round(total_attempts / len(logs), 2) if logs else 0.0,
+            "success_rate": round(successful / total * 100, 2),
+            "average_attempts": round(total_attempts / total, 2),
             "total_rows_returned": total_rows
         }
 
 
-# Global logger instance
-query_logger = QueryLogger()
+def __getattr__(name: str):
+    """
+    Provide the global `query_logger` instance lazily (PEP 562).
+    Importing the module does not touch the log file; it is opened on first access.
+    """
+    if name == "query_logger":
+        return QueryLogger()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
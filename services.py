@@ -2,10 +2,189 @@
 Service layer module implementing business logic.
 Separates business logic from UI and data access layers.
 """
-from typing import Dict, Any, Optional
+import hashlib
+import json
+import random
+import re
+import string
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import groupby
+from operator import attrgetter, itemgetter
+from typing import Callable, Dict, Any, Iterable, Optional
+import openai
 from clients import ClientFactory
 from config import config
 from query_logger import query_logger
+from prompt_templates import query_skeleton_cache, try_cached
+
+# Markdown code fences the model sometimes wraps its Flux output in
+_FENCE_RX = re.compile(r"```(?:flux)?")
+# First line of an InfluxDB error message that mentions a Flux runtime error
+_RUNTIME_ERROR_RX = re.compile(r"^.*runtime error.*$", re.IGNORECASE | re.MULTILINE)
+
+# Failure categories for summaries, checked in order; the first match wins.
+# Exception type names come first: Selenium timeouts read "Expected condition
+# failed: waiting for ...", which the assertion keywords would also match.
+_FAILURE_CATEGORIES = (
+    ("AssertionError", re.compile(r"AssertionError")),
+    ("TimeoutException", re.compile(r"TimeoutException")),
+    ("ElementNotFound", re.compile(r"NoSuchElementException")),
+    ("NullPointerException", re.compile(r"NullPointerException")),
+    ("Network/API", re.compile(r"ConnectionException")),
+    ("AssertionError", re.compile(r"assert|expected", re.IGNORECASE)),
+    ("TimeoutException", re.compile(r"timeout|waiting for", re.IGNORECASE)),
+    ("ElementNotFound", re.compile(r"element not found|not visible", re.IGNORECASE)),
+    ("Toast notification", re.compile(r"toast|notification", re.IGNORECASE)),
+    ("Network/API", re.compile(r"HTTP|\bAPI\b|network", re.IGNORECASE)),
+)
+_FAILURE_TEXT_COLUMNS = frozenset(("failure_stack", "failure_message"))
+# OpenAI errors that retrying can't fix (bad key, no access, invalid request)
+_FATAL_OPENAI_ERRORS = (
+    openai.AuthenticationError,
+    openai.PermissionDeniedError,
+    openai.BadRequestError,
+    openai.NotFoundError,
+)
+# Static checks run on generated Flux before it is sent to InfluxDB
+_TAG_AS_FIELD_RX = re.compile(r'r\._field\s*==\s*"(testname|status|owner|execution_number|environment)"')
+# A "/" after one of these (or at the start of a line) opens a regex literal, not a division
+_REGEX_PRECEDERS = frozenset(("", "~", "(", ",", ":", "[", "{", "="))
+# Longest string value sent to the summary model; longer ones are cut
+_PROMPT_MAX_STR = 400
+# Flux metadata columns dropped from query results
+_EXCLUDED_COLUMNS = frozenset(("result", "table", "_start", "_stop"))
+# FluxRecord accessors used when collecting results
+_record_table = attrgetter("table")
+_record_values = attrgetter("values")
+
+
+def _flux_regex_escape(text: str) -> str:
+    """
+    Escape text for use inside a Flux /regex/ literal.
+    Flux regexes are RE2, which accepts re.escape's backslash-escaped punctuation;
+    the "/" delimiter also has to be escaped.
+    """
+    return re.escape(text).replace("/", "\\/")
+
+
+def _categorize_failures(rows: list) -> tuple:
+    """
+    Categorize failure text locally, so the summary prompt carries counts and a
+    few example messages instead of every failure stack.
+    
+    Args:
+        rows: Result rows, possibly with failure_stack/failure_message columns
+        
+    Returns:
+        Tuple of (rows with a failure_category column in place of the failure
+        text, breakdown text for the prompt)
+    """
+    counts = Counter()
+    examples = {}
+    categorized = []
+    for row in rows:
+        text = row.get('failure_stack') or row.get('failure_message')
+        if not text:
+            categorized.append(row)
+            continue
+        text = str(text).strip()
+        category = next((name for name, rx in _FAILURE_CATEGORIES if rx.search(text)), "Other")
+        counts[category] += 1
+        category_examples = examples.setdefault(category, [])
+        if len(category_examples) < 2:
+            # The first line of a stack trace names the exception and its message
+            category_examples.append(text.split("\n", 1)[0][:200])
+        new_row = {k: v for k, v in row.items() if k not in _FAILURE_TEXT_COLUMNS}
+        new_row['failure_category'] = category
+        categorized.append(new_row)
+    
+    if not counts:
+        return rows, "None"
+    breakdown = ", ".join(f"{category}={count}" for category, count in counts.most_common())
+    representative = "\n".join(
+        f"  - {category}: {message}"
+        for category, _ in counts.most_common()
+        for message in examples[category]
+    )
+    return categorized, f"{breakdown}\nRepresentative messages:\n{representative}"
+
+
+def _check_brackets(flux_query: str) -> Optional[str]:
+    """
+    Check that parentheses, brackets and braces in a Flux query are balanced,
+    ignoring string literals, /regex/ literals, escaped characters and // comments.
+    
+    Returns:
+        Error message for the first mismatch, or None if balanced
+    """
+    closers = {")": "(", "]": "[", "}": "{"}
+    stack = []
+    in_string = False
+    # Last significant character outside literals; tells a regex from a division.
+    # Carried across lines so a "/" that starts a continuation line stays a division.
+    prev = ""
+    for line in flux_query.split("\n"):
+        escaped = False
+        in_regex = False
+        for i, ch in enumerate(line):
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif in_string:
+                if ch == '"':
+                    in_string = False
+            elif in_regex:
+                if ch == "/":
+                    in_regex = False
+                    prev = ch
+            elif ch == '"':
+                in_string = True
+                prev = ch
+            elif ch == "/":
+                if line.startswith("//", i):
+                    break
+                if prev in _REGEX_PRECEDERS:
+                    in_regex = True
+                else:
+                    prev = ch
+            else:
+                if ch in "([{":
+                    stack.append(ch)
+                elif ch in closers:
+                    if not stack or stack.pop() != closers[ch]:
+                        return f"Unbalanced '{ch}' in query"
+                if not ch.isspace():
+                    prev = ch
+    if stack:
+        return f"Unclosed '{stack[-1]}' in query (the query looks truncated)"
+    return None
+
+
+def _retry_delay(attempt: int) -> float:
+    """Exponential backoff with random jitter before retrying after the given attempt."""
+    delay = config.RETRY_BASE_DELAY * (2 ** (attempt - 1)) * (1 + random.uniform(0, config.RETRY_JITTER))
+    return min(config.RETRY_MAX_DELAY, delay)
+
+
+def _compact_data(rows: list, max_str: int = _PROMPT_MAX_STR) -> str:
+    """
+    Serialize result rows as JSON for the summary prompt, cutting any string
+    value longer than max_str so one large field can't dominate the prompt.
+    """
+    def clip(value):
+        if isinstance(value, str) and len(value) > max_str:
+            return f"{value[:max_str]}…<truncated {len(value) - max_str} chars>"
+        return value
+    
+    # default=str covers the datetime values in _time columns
+    return json.dumps(
+        [{k: clip(v) for k, v in row.items()} for row in rows],
+        default=str,
+        ensure_ascii=False
+    )
 
 
 class FluxQueryService:
@@ -14,6 +193,43 @@ class FluxQueryService:
     Implements Repository pattern for data access.
     """
     
+    @staticmethod
+    def _column_filter(columns: Iterable[str], excluded_columns: frozenset) -> Callable[[dict], dict]:
+        """
+        Build a function copying a record's values without the excluded columns.
+        
+        Every record in a Flux table has the same columns, so the kept keys are
+        worked out once per table instead of being tested on every record.
+        """
+        kept = tuple(k for k in columns if k not in excluded_columns)
+        if not kept:
+            return lambda values: {}
+        if len(kept) == 1:
+            # itemgetter with a single key returns the value rather than a tuple
+            key = kept[0]
+            return lambda values: {key: values[key]}
+        getter = itemgetter(*kept)
+        return lambda values: dict(zip(kept, getter(values)))
+    
+    @staticmethod
+    def execute_flux_queries(*queries: str, execution_number: str = None) -> list:
+        """
+        Execute independent Flux queries concurrently, one thread per query.
+        Total latency is that of the slowest query instead of the sum of all.
+        
+        Args:
+            queries: Flux query strings
+            execution_number: Optional execution number to replace in every query
+            
+        Returns:
+            List of execute_flux_query() results, in the order of the queries
+        """
+        with ThreadPoolExecutor(max_workers=max(len(queries), 1)) as executor:
+            return list(executor.map(
+                lambda query: FluxQueryService.execute_flux_query(query, execution_number),
+                queries
+            ))
+    
     @staticmethod
     def execute_flux_query(query: str, execution_number: str = None) -> Dict[str, Any]:
         """
@@ -30,8 +246,8 @@ class FluxQueryService:
             execution_number = config.DEFAULT_EXECUTION_NUMBER
             
         try:
-            client = ClientFactory.get_influx_client()
-            if not client:
+            query_api = ClientFactory.get_influx_query_api()
+            if not query_api:
                 return {
                     "success": False,
                     "data": None,
@@ -39,20 +255,20 @@ class FluxQueryService:
                     "row_count": 0
                 }
             
-            query_api = client.query_api()
             # Ensure execution_number is a string
             processed_query = query.replace("${execution_number}", str(execution_number))
-            tables = query_api.query(processed_query, org=config.INFLUX_ORG)
+            # query_stream yields records as the response is parsed, instead of
+            # building every FluxTable in memory before the loop can start
+            records = query_api.query_stream(processed_query, org=config.INFLUX_ORG)
             
             results = []
-            # Metadata columns to exclude
-            excluded_columns = {'result', 'table', '_start', '_stop'}
-            
-            for table in tables:
-                for record in table.records:
-                    # Filter out unwanted metadata columns
-                    filtered_values = {k: v for k, v in record.values.items() if k not in excluded_columns}
-                    results.append(filtered_values)
+            # Records arrive table by table; each table's metadata column filter is
+            # built from its first record, then map() runs it over the rest in C
+            for _, table_records in groupby(records, key=_record_table):
+                first = next(table_records)
+                filter_values = FluxQueryService._column_filter(first.values, _EXCLUDED_COLUMNS)
+                results.append(filter_values(first.values))
+                results.extend(map(filter_values, map(_record_values, table_records)))
             
             return {
                 "success": True,
@@ -63,12 +279,10 @@ class FluxQueryService:
             
         except Exception as e:
             error_msg = str(e)
-            if "runtime error" in error_msg.lower():
-                lines = error_msg.split("\n")
-                for line in lines:
-                    if "runtime error" in line.lower():
-                        error_msg = line.strip()
-                        break
+            # Report only the line carrying the Flux runtime error, when there is one
+            match = _RUNTIME_ERROR_RX.search(error_msg)
+            if match:
+                error_msg = match.group(0).strip()
             
             return {
                 "success": False,
@@ -113,6 +327,7 @@ Flaky → reduce() to count PASS/FAIL, filter where both > 0
 "slower than X" → duration > X (group by testname, max(), then filter)
 "faster than X" → duration < X (group by testname, max(), then filter)
 Failure reason search ("failing due to X", "errors about X"): Filter by status == "FAIL", then filter by _field == "failure_message" or _field == "failure_stack", then search _value with regex /(?i)X/ for case-insensitive match. Group by testname to get unique tests.
+Failure details ("why did X fail", "failures with reasons/stack traces"): Filter by status == "FAIL", keep both duration and failure_stack fields and pivot them into one row, so the reasons come back with the failures.
 
 OPERATIONS:
 - Sort: "slowest"/"fastest" → sort by duration, "most failed" → sort by count
@@ -126,6 +341,8 @@ Status: |> filter(fn: (r) => r.testname == "X") |> filter(fn: (r) => r.execution
 
 Failed: |> filter(fn: (r) => r.status == "FAIL") |> filter(fn: (r) => r._field == "duration") |> keep(columns: ["testname", "status", "_value"])
 
+Failed with reasons: |> filter(fn: (r) => r.status == "FAIL") |> filter(fn: (r) => r._field == "duration" or r._field == "failure_stack") |> pivot(rowKey: ["testname", "execution_number"], columnKey: ["_field"], valueColumn: "_value") |> keep(columns: ["testname", "status", "duration", "failure_stack"])
+
 Count: |> filter(fn: (r) => r._field == "duration") |> group(columns: ["status"]) |> count() |> rename(columns: {_value: "count"})
 
 Top N: |> filter(fn: (r) => r._field == "duration") |> sort(columns: ["_value"], desc: true) |> limit(n: N) |> keep(columns: ["testname", "_value"])
@@ -145,6 +362,14 @@ Flaky (singular): |> filter(fn: (r) => r._field == "duration") |> group(columns:
 OUTPUT: Only Flux query, no markdown/comments. Start with: from(bucket: "testexecution")
 """
 
+    # QUERY_ANALYSIS_PROMPT is always sent verbatim as messages[0] and retries only
+    # append turns after it, so OpenAI's prompt caching can reuse the prefix. The
+    # cache key routes every request sharing that prefix to the same cache.
+    QUERY_PROMPT_CACHE_KEY = hashlib.sha1(QUERY_ANALYSIS_PROMPT.encode("utf-8")).hexdigest()
+    # Built once and shared by every conversation; never mutate it. A plain dict
+    # rather than a MappingProxyType so every openai version can serialize it.
+    _QUERY_SYSTEM_MESSAGE = {"role": "system", "content": QUERY_ANALYSIS_PROMPT}
+
     SUMMARY_GENERATION_PROMPT = """
 You are a data analyst expert specializing in test execution analysis.
 
@@ -154,13 +379,14 @@ CRITICAL RULES:
 1. **COUNT ACCURATELY**: Count the actual number of rows/items in the data. If row_count is provided, use it. If counting unique testnames, count them correctly.
 2. **ANALYZE THE DATA**: Look at the actual columns and values in the data provided. Don't assume patterns.
 3. **BE DATA-DRIVEN**: Generate insights based on what's actually in the data, not on query type assumptions.
-4. **FAILURE CATEGORIZATION**: If failure_stack or failure_message columns exist, analyze and categorize failures by error type (AssertionError, TimeoutException, NullPointerException, ElementNotFound, Toast notification issues, etc.)
+4. **FAILURE CATEGORIZATION**: Failure text (failure_stack/failure_message) is categorized before it reaches you: failed rows carry a failure_category column, and the Failure Breakdown gives the count per error type (AssertionError, TimeoutException, NullPointerException, ElementNotFound, Toast notification issues, etc.) with representative messages
 
 INPUT:
 - User Query: {user_query}
 - Flux Query: {flux_query}
 - Result Data: {data} (NOTE: This may be a sample. Use row_count for total.)
 - Row Count: {row_count} (THIS IS THE TOTAL - USE THIS FOR COUNTS, NOT THE DATA ARRAY SIZE)
+- Failure Breakdown: {failure_breakdown} (counted from the data sample)
 
 ANALYSIS PROCESS:
 
@@ -173,17 +399,8 @@ ANALYSIS PROCESS:
 
 2. **ANALYZE FAILURES** (if status=FAIL or failure data exists):
    - **Total failures = row_count** (use this number, not the data array size)
-   - If failure_stack or failure_message exists in the data sample:
-     * Analyze the sample for failure patterns
-     * Categorize failures by error type found in the sample:
-       - AssertionError / Assertion failures (look for "AssertionError", "assert", "expected")
-       - TimeoutException / Timeout issues (look for "TimeoutException", "timeout", "waiting for")
-       - ElementNotFound / Element visibility issues (look for "NoSuchElementException", "element not found", "not visible")
-       - Toast notification issues (look for "toast", "notification", "message")
-       - Network/API issues (look for "ConnectionException", "HTTP", "API", "network")
-       - NullPointerException
-       - Other error types
-     * Count occurrences of each category in the sample
+   - If a Failure Breakdown is provided:
+     * Use its category counts for the sample and its representative messages for failure patterns
      * Extrapolate to total failures using row_count (e.g., if 5 out of 20 sample failures are toast-related, estimate ~25% of total)
    - Identify most common failure categories
    - Extract specific error patterns and root causes
@@ -220,70 +437,201 @@ OUTPUT FORMAT:
 IMPORTANT:
 - DO NOT use hardcoded patterns or templates
 - DO NOT assume counts - count from the actual data
-- DO analyze failure_stack/failure_message if present
-- DO categorize failures by error type when applicable
+- DO use the Failure Breakdown and failure_category when present
+- DO report failures by error type when applicable
 - DO adapt the summary structure to what the data contains
 
 NOW ANALYZE THE DATA AND GENERATE THE SUMMARY.
 """
+
+    # Parsed once at import; the {name} fields become $-placeholders, so formatting
+    # doesn't rescan the whole template for braces on every summary
+    _SUMMARY_TEMPLATE = string.Template(re.sub(r"\{(\w+)\}", r"${\1}", SUMMARY_GENERATION_PROMPT))
+    
+    # Sampling temperatures for speculative first-attempt candidates; the first is
+    # the one the sequential loop uses, so it is the one retried on failure
+    _SPECULATIVE_TEMPERATURES = (0, 0.2, 0.5)
+    # Flux answers are usually under 200 tokens; the cap leaves room for two-build
+    # comparison queries while bounding runaway prose. A truncated query fails
+    # the bracket check in _static_validate and is retried without hitting InfluxDB.
+    _GENERATION_MAX_TOKENS = 512
     
     @staticmethod
-    def generate_flux_query_only(
-        user_query: str, 
-        execution_number: str = None, 
-        max_retries: int = None
+    def _generate_candidate(messages: list, temperature: float) -> str:
+        """
+        Ask the model for one Flux query and strip any markdown fences from it.
+        
+        The response is streamed so reading can stop at the end of a fenced code
+        block; any prose the model adds after the query is never waited for.
+        """
+        openai_client = ClientFactory.get_openai_client()
+        stream = openai_client.chat.completions.create(
+            model=config.OPENAI_MODEL,
+            temperature=temperature,
+            messages=messages,
+            max_tokens=OpenAIQueryGenerationService._GENERATION_MAX_TOKENS,
+            stop=["\n\n\n"],
+            stream=True,
+            # Sent through extra_body so older openai clients accept it too
+            extra_body={"prompt_cache_key": OpenAIQueryGenerationService.QUERY_PROMPT_CACHE_KEY}
+        )
+        
+        parts = []
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                parts.append(delta)
+                if "`" in delta:
+                    # A fence may be split across chunks, so look at the text so far
+                    content = "".join(parts)
+                    opening = content.find("```")
+                    closing = content.find("```", opening + 3) if opening >= 0 else -1
+                    if closing >= 0:
+                        parts = [content[:closing + 3]]
+                        break
+        finally:
+            stream.response.close()
+        return _FENCE_RX.sub("", "".join(parts)).strip()
+    
+    @staticmethod
+    def _static_validate(flux_query: str) -> Optional[str]:
+        """
+        Check a generated query against the prompt's hard rules without running it.
+        
+        Returns:
+            Error message describing the first violation found, or None
+        """
+        match = _TAG_AS_FIELD_RX.search(flux_query)
+        if match:
+            tag = match.group(1)
+            return f'"{tag}" is a tag, not a field: filter it directly as r.{tag}, never through r._field'
+        return _check_brackets(flux_query)
+    
+    @staticmethod
+    def _validate_and_execute(flux_query: str, execution_number: str) -> Dict[str, Any]:
+        """
+        Execute a generated query, unless static validation already shows it is
+        wrong; then the violation is returned as the error without an InfluxDB round trip.
+        """
+        violation = OpenAIQueryGenerationService._static_validate(flux_query)
+        if violation:
+            return {
+                "success": False,
+                "data": None,
+                "error": f"Static validation failed: {violation}",
+                "row_count": 0
+            }
+        return FluxQueryService.execute_flux_query(flux_query, execution_number)
+    
+    @staticmethod
+    def _speculate(messages: list, execution_number: str, candidates: int) -> tuple:
+        """
+        Generate and execute several candidate queries in parallel at different
+        temperatures, returning the first one that runs successfully.
+        
+        Args:
+            messages: Chat messages for the first attempt
+            execution_number: Execution number for query substitution
+            candidates: Number of candidates, capped at the number of temperatures
+            
+        Returns:
+            Tuple of (flux_query, execution result). If no candidate succeeds, the
+            temperature-0 candidate is returned so the retry feedback matches the
+            sequential loop; its result is None when the model answered "ERROR:".
+        """
+        def run_candidate(temperature: float) -> tuple:
+            flux_query = OpenAIQueryGenerationService._generate_candidate(messages, temperature)
+            if flux_query.startswith("ERROR:"):
+                return flux_query, None
+            return flux_query, OpenAIQueryGenerationService._validate_and_execute(flux_query, execution_number)
+        
+        temperatures = OpenAIQueryGenerationService._SPECULATIVE_TEMPERATURES[:candidates]
+        # Not used as a context manager: leaving the with block would wait for the
+        # slower candidates, which is exactly the latency this avoids
+        executor = ThreadPoolExecutor(max_workers=len(temperatures))
+        try:
+            futures = [executor.submit(run_candidate, t) for t in temperatures]
+            for future in as_completed(futures):
+                if future.exception() is None:
+                    flux_query, result = future.result()
+                    if result is not None and result["success"]:
+                        return flux_query, result
+            # Raises the temperature-0 candidate's exception, if it had one
+            return futures[0].result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    @staticmethod
+    def _run_generation_loop(
+        user_query: str,
+        execution_number: str,
+        max_retries: int
     ) -> Dict[str, Any]:
         """
-        Generate Flux query with validation and retry logic.
-        Returns only the query without executing it.
+        Generate a Flux query and validate it against InfluxDB, feeding errors back
+        to the model on each retry. Shared by generate_flux_query_only() and
+        generate_flux_with_validation().
         
         Args:
             user_query: Natural language query from user
-            execution_number: Optional execution number for query substitution
+            execution_number: Execution number for query substitution
             max_retries: Maximum number of retry attempts
             
         Returns:
-            Dictionary with query, success status, error, and attempts
+            Dictionary with query, success status, data, error, attempts, and row_count
         """
-        if execution_number is None:
-            execution_number = config.DEFAULT_EXECUTION_NUMBER
-        if max_retries is None:
-            max_retries = config.MAX_RETRIES
-        
         messages = [
-            {"role": "system", "content": OpenAIQueryGenerationService.QUERY_ANALYSIS_PROMPT},
+            OpenAIQueryGenerationService._QUERY_SYSTEM_MESSAGE,
             {"role": "user", "content": user_query}
         ]
+        # Results of queries already tried in this loop; at temperature 0 the model
+        # often returns the same query after feedback, and it would fail the same way
+        seen = {}
         
         for attempt in range(1, max_retries + 1):
             try:
-                openai_client = ClientFactory.get_openai_client()
-                response = openai_client.chat.completions.create(
-                    model=config.OPENAI_MODEL,
-                    temperature=0,
-                    messages=messages
-                )
-                
-                flux_query = response.choices[0].message.content.strip()
-                flux_query = flux_query.replace("```flux", "").replace("```", "").strip()
+                result = None
+                if attempt == 1 and config.SPECULATIVE_CANDIDATES > 1:
+                    flux_query, result = OpenAIQueryGenerationService._speculate(
+                        messages, execution_number, config.SPECULATIVE_CANDIDATES
+                    )
+                else:
+                    flux_query = OpenAIQueryGenerationService._generate_candidate(messages, 0)
                 
                 if flux_query.startswith("ERROR:"):
                     return {
                         "query": flux_query,
                         "success": False,
+                        "data": None,
                         "error": flux_query,
-                        "attempts": attempt
+                        "attempts": attempt,
+                        "row_count": 0
                     }
                 
-                # Test the query
-                result = FluxQueryService.execute_flux_query(flux_query, execution_number)
+                # Test the query, unless this exact query was already run
+                repeated = flux_query in seen
+                if result is None:
+                    if repeated:
+                        result = seen[flux_query]
+                    else:
+                        result = OpenAIQueryGenerationService._validate_and_execute(flux_query, execution_number)
+                seen[flux_query] = result
                 
                 if result["success"]:
+                    query_skeleton_cache.put(
+                        user_query, OpenAIQueryGenerationService.QUERY_ANALYSIS_PROMPT, flux_query
+                    )
                     return {
                         "query": flux_query,
                         "success": True,
+                        "data": result["data"],
                         "error": None,
-                        "attempts": attempt
+                        "attempts": attempt,
+                        "row_count": result["row_count"]
                     }
                 else:
                     if attempt < max_retries:
@@ -303,30 +651,98 @@ Analyze the error and generate a corrected query. Common fixes:
 
 Generate the corrected query:
 """
+                        if repeated:
+                            error_feedback = (
+                                "\nYou produced the same failing query as before. "
+                                "Try a DIFFERENT approach this time.\n" + error_feedback
+                            )
                         messages.append({"role": "assistant", "content": flux_query})
                         messages.append({"role": "user", "content": error_feedback})
                     else:
                         return {
                             "query": flux_query,
                             "success": False,
+                            "data": None,
                             "error": result["error"],
-                            "attempts": attempt
+                            "attempts": attempt,
+                            "row_count": 0
                         }
             
             except Exception as e:
-                if attempt == max_retries:
+                if attempt == max_retries or isinstance(e, _FATAL_OPENAI_ERRORS):
                     return {
                         "query": "",
                         "success": False,
+                        "data": None,
                         "error": f"Generation error: {str(e)}",
-                        "attempts": attempt
+                        "attempts": attempt,
+                        "row_count": 0
                     }
+                # Likely transient (rate limit, connection, server error) - back off
+                # instead of retrying straight into the same failure
+                time.sleep(_retry_delay(attempt))
         
         return {
             "query": "",
             "success": False,
+            "data": None,
             "error": "Max retries reached",
-            "attempts": max_retries
+            "attempts": max_retries,
+            "row_count": 0
+        }
+
+    @staticmethod
+    def generate_flux_query_only(
+        user_query: str, 
+        execution_number: str = None, 
+        max_retries: int = None
+    ) -> Dict[str, Any]:
+        """
+        Generate Flux query with validation and retry logic.
+        Returns the query without a summary; a successful query comes with the
+        rows from its validation run, so callers need not execute it again.
+        
+        Args:
+            user_query: Natural language query from user
+            execution_number: Optional execution number for query substitution
+            max_retries: Maximum number of retry attempts
+            
+        Returns:
+            Dictionary with query, success status, error, attempts, data, and row_count
+        """
+        if execution_number is None:
+            execution_number = config.DEFAULT_EXECUTION_NUMBER
+        if max_retries is None:
+            max_retries = config.MAX_RETRIES
+        
+        # A query asked before was already generated and validated - reuse it if
+        # it still executes; otherwise evict it and generate a new one
+        cached_query = try_cached(user_query, OpenAIQueryGenerationService.QUERY_ANALYSIS_PROMPT)
+        if cached_query is not None:
+            cached_result = FluxQueryService.execute_flux_query(cached_query, execution_number)
+            if cached_result["success"]:
+                return {
+                    "query": cached_query,
+                    "success": True,
+                    "error": None,
+                    "attempts": 0,
+                    "data": cached_result["data"],
+                    "row_count": cached_result["row_count"]
+                }
+            query_skeleton_cache.discard(user_query, OpenAIQueryGenerationService.QUERY_ANALYSIS_PROMPT)
+        
+        result = OpenAIQueryGenerationService._run_generation_loop(
+            user_query,
+            execution_number,
+            max_retries
+        )
+        return {
+            "query": result["query"],
+            "success": result["success"],
+            "error": result["error"],
+            "attempts": result["attempts"],
+            "data": result["data"],
+            "row_count": result["row_count"]
         }
 
     @staticmethod
@@ -354,32 +770,36 @@ Generate the corrected query:
         try:
             # Limit data sent to LLM to avoid token overflow, but use larger sample for better analysis
             # Use up to 50 rows for better failure categorization, but cap at 50 to manage tokens
-            sample_size = min(100, len(data))
+            sample_size = min(50, len(data))
             sample_data = data[:sample_size] if len(data) > sample_size else data
             
-            # Check if we need to fetch failure_stack for FAIL status
+            # Check if we need to fetch failure_stack for FAIL status, and whether
+            # it is already in the data, in a single pass over the sample
             needs_failure_analysis = False
-            if sample_data and len(sample_data) > 0:
-                # Check if query is about failures or status query that returned FAIL
-                for row in sample_data[:5]:  # Check first 5 rows
-                    if row.get('status') == 'FAIL':
-                        needs_failure_analysis = True
-                        break
+            has_failure_stack = False
+            for i, row in enumerate(sample_data):
+                # Check if query is about failures or status query that returned FAIL (first 5 rows)
+                if i < 5 and row.get('status') == 'FAIL':
+                    needs_failure_analysis = True
+                elif i >= 5 and not needs_failure_analysis:
+                    break
+                if 'failure_stack' in row:
+                    has_failure_stack = True
+                    break
             
-            # Fetch failure_stack if needed and not already in data
+            # Fetch failure_stack if needed and not already in data. Queries asking for
+            # failure details are prompted to return it, which skips this second round trip
             enhanced_data = sample_data
-            if needs_failure_analysis:
-                # Check if failure_stack is already in the data
-                has_failure_stack = any('failure_stack' in row for row in sample_data if row)
-                
-                if not has_failure_stack and sample_data:
-                    # Fetch failure_stack for failed tests
-                    try:
-                        testnames = list(set([row.get('testname') for row in sample_data[:10] if row.get('testname')]))
-                        if testnames and execution_number:
-                            # Build a query to fetch failure_stack
-                            testname_filter = ' or '.join([f'r.testname == "{t}"' for t in testnames[:5]])
-                            failure_query = f'''
+            if needs_failure_analysis and not has_failure_stack:
+                # Fetch failure_stack for failed tests
+                try:
+                    testnames = sorted({testname for row in sample_data[:10] if (testname := row.get('testname'))})
+                    if testnames and execution_number:
+                        # Build a query to fetch failure_stack
+                        # One anchored regex instead of a chain of equality checks
+                        testname_pattern = '|'.join(_flux_regex_escape(t) for t in testnames[:5])
+                        testname_filter = f'r.testname =~ /^({testname_pattern})$/'
+                        failure_query = f'''
 from(bucket: "testexecution")
   |> range(start: 1970-01-01T00:00:00Z)
   |> filter(fn: (r) => r._measurement == "testmethod")
@@ -389,27 +809,30 @@ from(bucket: "testexecution")
   |> filter(fn: (r) => r._field == "failure_stack")
   |> keep(columns: ["testname", "failure_stack", "_value"])
 '''
-                            result = FluxQueryService.execute_flux_query(failure_query, execution_number)
-                            if result["success"] and result["data"]:
-                                # Merge failure_stack into sample_data
-                                failure_map = {row.get('testname'): row.get('_value', '') for row in result["data"]}
-                                enhanced_data = []
-                                for row in sample_data:
-                                    new_row = row.copy()
-                                    testname = row.get('testname')
-                                    if testname in failure_map:
-                                        new_row['failure_stack'] = failure_map[testname]
-                                    enhanced_data.append(new_row)
-                    except Exception as e:
-                        # If failure_stack fetch fails, continue with original data
-                        enhanced_data = sample_data
+                        result = FluxQueryService.execute_flux_query(failure_query, execution_number)
+                        if result["success"] and result["data"]:
+                            # Merge failure_stack into sample_data
+                            failure_map = {row.get('testname'): row.get('_value', '') for row in result["data"]}
+                            # Rows without a fetched stack are reused as-is rather than copied
+                            enhanced_data = [
+                                {**row, 'failure_stack': failure_map[row.get('testname')]}
+                                if row.get('testname') in failure_map else row
+                                for row in sample_data
+                            ]
+                except Exception as e:
+                    # If failure_stack fetch fails, continue with original data
+                    enhanced_data = sample_data
+            
+            # Categorize failures here and send counts plus a few examples, not every stack
+            enhanced_data, failure_breakdown = _categorize_failures(enhanced_data)
             
             # Format the prompt
-            prompt = OpenAIQueryGenerationService.SUMMARY_GENERATION_PROMPT.format(
+            prompt = OpenAIQueryGenerationService._SUMMARY_TEMPLATE.substitute(
                 user_query=user_query,
                 flux_query=flux_query,
-                data=enhanced_data,
-                row_count=row_count
+                data=_compact_data(enhanced_data),
+                row_count=row_count,
+                failure_breakdown=failure_breakdown
             )
             
             openai_client = ClientFactory.get_openai_client()
@@ -489,8 +912,11 @@ from(bucket: "testexecution")
         flux_query = query_result["query"]
         attempts = query_result["attempts"]
         
-        # Step 2: Execute the query
-        exec_result = FluxQueryService.execute_flux_query(flux_query, execution_number)
+        # Step 2: Execute the query, unless step 1 already returned its rows
+        if query_result.get("data") is not None:
+            exec_result = query_result
+        else:
+            exec_result = FluxQueryService.execute_flux_query(flux_query, execution_number)
         
         if not exec_result["success"]:
             # Query execution failed
@@ -572,144 +998,37 @@ from(bucket: "testexecution")
         if max_retries is None:
             max_retries = config.MAX_RETRIES
         
-        messages = [
-            {"role": "system", "content": OpenAIQueryGenerationService.QUERY_ANALYSIS_PROMPT},
-            {"role": "user", "content": user_query}
-        ]
-        
-        for attempt in range(1, max_retries + 1):
-            try:
-                openai_client = ClientFactory.get_openai_client()
-                response = openai_client.chat.completions.create(
-                    model=config.OPENAI_MODEL,
-                    temperature=0,
-                    messages=messages
-                )
-                
-                flux_query = response.choices[0].message.content.strip()
-                flux_query = flux_query.replace("```flux", "").replace("```", "").strip()
-                
-                if flux_query.startswith("ERROR:"):
-                    response = {
-                        "query": flux_query,
-                        "success": False,
-                        "data": None,
-                        "error": flux_query,
-                        "attempts": attempt,
-                        "row_count": 0
-                    }
-                    # Log error query
-                    query_logger.log_query(
-                        user_query=user_query,
-                        flux_query=flux_query,
-                        execution_number=execution_number,
-                        success=False,
-                        row_count=0,
-                        error=flux_query,
-                        attempts=attempt
-                    )
-                    return response
-                
-                result = FluxQueryService.execute_flux_query(flux_query, execution_number)
-                
-                if result["success"]:
-                    response = {
-                        "query": flux_query,
-                        "success": True,
-                        "data": result["data"],
-                        "error": None,
-                        "attempts": attempt,
-                        "row_count": result["row_count"]
-                    }
-                    # Log successful query
-                    query_logger.log_query(
-                        user_query=user_query,
-                        flux_query=flux_query,
-                        execution_number=execution_number,
-                        success=True,
-                        row_count=result["row_count"],
-                        attempts=attempt
-                    )
-                    return response
-                else:
-                    if attempt < max_retries:
-                        error_feedback = f"""
-The query failed with this error:
-{result['error']}
-
-FAILED QUERY:
-{flux_query}
-
-Analyze the error and generate a corrected query following these rules:
-1. Filter by _field BEFORE pivot/group to avoid schema collision
-2. Check 'exists r.owner' before filtering by owner
-3. Status values must be uppercase: "FAIL", "PASS", "SKIP"
-4. Never mix numeric and string fields
-
-Generate the corrected query:
-"""
-                        messages.append({"role": "assistant", "content": flux_query})
-                        messages.append({"role": "user", "content": error_feedback})
-                    else:
-                        response = {
-                            "query": flux_query,
-                            "success": False,
-                            "data": None,
-                            "error": result["error"],
-                            "attempts": attempt,
-                            "row_count": 0
-                        }
-                        # Log failed query after all retries exhausted
-                        query_logger.log_query(
-                            user_query=user_query,
-                            flux_query=flux_query,
-                            execution_number=execution_number,
-                            success=False,
-                            row_count=0,
-                            error=result["error"],
-                            attempts=attempt
-                        )
-                        return response
-            
-            except Exception as e:
-                if attempt == max_retries:
-                    response = {
-                        "query": "",
-                        "success": False,
-                        "data": None,
-                        "error": f"Generation error: {str(e)}",
-                        "attempts": attempt,
-                        "row_count": 0
-                    }
-                    # Log generation error
-                    query_logger.log_query(
-                        user_query=user_query,
-                        flux_query="",
-                        execution_number=execution_number,
-                        success=False,
-                        row_count=0,
-                        error=f"Generation error: {str(e)}",
-                        attempts=attempt
-                    )
-                    return response
+        # A query asked before was already generated and validated - run it
+        # directly; if it no longer executes, fall back to generating a new one
+        result = None
+        cached_query = try_cached(user_query, OpenAIQueryGenerationService.QUERY_ANALYSIS_PROMPT)
+        if cached_query is not None:
+            cached_result = FluxQueryService.execute_flux_query(cached_query, execution_number)
+            if cached_result["success"]:
+                result = {
+                    "query": cached_query,
+                    "success": True,
+                    "data": cached_result["data"],
+                    "error": None,
+                    "attempts": 0,
+                    "row_count": cached_result["row_count"]
+                }
+            else:
+                query_skeleton_cache.discard(user_query, OpenAIQueryGenerationService.QUERY_ANALYSIS_PROMPT)
         
-        response = {
-            "query": "",
-            "success": False,
-            "data": None,
-            "error": "Max retries reached",
-            "attempts": max_retries,
-            "row_count": 0
-        }
-        # Log max retries error
+        if result is None:
+            result = OpenAIQueryGenerationService._run_generation_loop(
+                user_query,
+                execution_number,
+                max_retries
+            )
         query_logger.log_query(
             user_query=user_query,
-            flux_query="",
+            flux_query=result["query"],
             execution_number=execution_number,
-            success=False,
-            row_count=0,
-            error="Max retries reached",
-            attempts=max_retries
+            success=result["success"],
+            row_count=result["row_count"],
+            error=result["error"],
+            attempts=result["attempts"]
         )
-        return response
-
+        return result
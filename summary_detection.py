@@ -0,0 +1,194 @@
+"""
+Detection of summary requests in natural-language queries.
+"""
+import re
+from typing import Optional
+
+# =========================
+# SUMMARY REQUEST PATTERNS
+# =========================
+# Compiled once at import. This lives outside app.py because Streamlit re-executes
+# the app script on every rerun, but imported modules are only loaded once.
+
+# Each family is a single alternation so the query is scanned once per family.
+# Alternatives keep their original order (first alternative wins at a position).
+
+# Build summary detection - MUST come before script summary to avoid conflicts
+_BUILD_SUMMARY_RX = re.compile(
+    r"(?:about|show\s+me)\s+(?:build|execution)\s+(\d+)"
+    r"|(?:build|execution)\s+(\d+)\s+summary"
+    r"|build\s+summary"
+    r"|summary\s+of\s+build"
+)
+
+# Explicit "script"/"test" keyword forms are tried before the looser phrasings
+_SCRIPT_RX = re.compile(
+    r"(?:about|summary\s+of|analyze)\s+(?:script|test)\s+([A-Za-z][A-Za-z0-9_]*)"
+)
+
+_SCRIPT_LOOSE_RX = re.compile(
+    r"(?:tell\s+me|give\s+me|what)\s+about\s+([A-Za-z][A-Za-z0-9_]*)"
+)
+
+_EXPLAIN_RX = re.compile(r"explain\s+([A-Za-z][A-Za-z0-9_]*)")
+
+_FLAKY_RX = re.compile(
+    r"flaky\s+(?:scripts?|tests?)\s+summary"
+    r"|summary\s+of\s+flaky\s+scripts?"
+    r"|unstable\s+scripts?\s+summary"
+)
+
+# Comparisons naming two executions are tried before the implicit ones
+_COMPARISON_EXECS_RX = re.compile(
+    r"compare\s+(?:builds?|executions?)\s+(\d+)(?:\s+(?:and|vs|with)\s+|\s*,\s*)(\d+)"
+    r"|builds?\s+(\d+)\s+(?:and|vs|with)\s+builds?\s+(\d+)"
+    r"|executions?\s+(\d+)\s+(?:and|vs|with)\s+executions?\s+(\d+)"
+)
+
+# Implicit comparisons are fixed phrases, matched with substring checks once
+# runs of whitespace are collapsed to single spaces
+_FIXED_COMPARISON_PHRASES = (
+    "compare build",
+    "compare execution",
+    "build comparison",
+    "yesterday vs today",
+    "compare previous vs current",
+    "previous build vs current",
+    "last build vs current"
+)
+_WHITESPACE_RX = re.compile(r"\s+")
+
+_EXEC_NUM_RX = re.compile(r"(?:build|execution)\s+(\d+)")
+_SUMMARY_ABOUT_RX = re.compile(r"(?:give\s+me\s+)?summary\s+about\s+(\S+)")
+_ABOUT_RX = re.compile(r"about\s+([A-Za-z][A-Za-z0-9_]*)")
+# Case-insensitive twins, used only when lower() changed the query's length
+_CASE_INSENSITIVE_RX = {
+    rx: re.compile(rx.pattern, re.IGNORECASE) for rx in (_SUMMARY_ABOUT_RX, _ABOUT_RX)
+}
+_ABOUT_KW_RX = re.compile(r"about\s+(?:script|test|build|execution)")
+# Matched at the end of the "about <name>" match, so no slice of the query is needed
+_DIGIT_AFTER_RX = re.compile(r"\s*\d")
+_TOP_N_RX = re.compile(r"top\s+(\d+)")
+
+# Every pattern family above needs at least one of these words, so checking
+# for them tells us which families are worth running
+_TRIGGER_WORDS = (
+    "about", "analyze", "build", "compare", "execution", "explain",
+    "failing", "flaky", "summary", "top", "vs"
+)
+_BUILD_TRIGGERS = frozenset({"build", "execution"})
+_SCRIPT_TRIGGERS = frozenset({"about", "analyze", "explain", "summary"})
+_COMPARISON_TRIGGERS = frozenset({"build", "compare", "execution", "vs"})
+
+
+# Helper function to recover a test name's original casing
+def original_case_group(query: str, query_lower: str, match: re.Match) -> str:
+    """
+    Return group 1 of a match found in query_lower, with the casing from query.
+    Returns: the captured text as the user typed it (preserves camelCase)
+    """
+    if len(query) == len(query_lower):
+        # lower() mapped every character one-to-one, so the spans line up
+        return query[match.start(1):match.end(1)]
+    # Rare non-ASCII case where lowering changed the length
+    original_match = _CASE_INSENSITIVE_RX[match.re].search(query)
+    return original_match.group(1) if original_match else match.group(1)
+
+# Summary detectors - each matches one family of summary requests
+# Every detector returns (summary_type, param), or None when its family does not match
+def match_build_summary(query: str, query_lower: str, triggers: set):
+    if (match := _BUILD_SUMMARY_RX.search(query_lower)):
+        # Extract execution number if mentioned
+        if match.lastindex:
+            return ("build_summary", match.group(match.lastindex))
+        exec_match = _EXEC_NUM_RX.search(query_lower)
+        return ("build_summary", exec_match.group(1) if exec_match else None)
+    return None
+
+def match_script_summary(query: str, query_lower: str, triggers: set):
+    # Script summary detection - improved to handle various formats
+    # First, try patterns with explicit keywords
+    if (match := (
+        _SCRIPT_RX.search(query_lower)
+        or _SCRIPT_LOOSE_RX.search(query_lower)
+        or _EXPLAIN_RX.search(query_lower)
+    )):
+        return ("script_summary", match.group(1))
+    return None
+
+def match_summary_about(query: str, query_lower: str, triggers: set):
+    # Handle "summary about <testname>" or "give me summary about <testname>"
+    # Use \S+ to capture all non-whitespace characters (handles long camelCase names)
+    if (match := _SUMMARY_ABOUT_RX.search(query_lower)):
+        # Take the name from the original query to preserve camelCase
+        return ("script_summary", original_case_group(query, query_lower, match).strip())
+    return None
+
+def match_about_name(query: str, query_lower: str, triggers: set):
+    # Handle "about <testname>" without "script" or "test" keyword (must be a valid test name)
+    # BUT exclude if it's about a build/execution number
+    if (about_match := _ABOUT_RX.search(query_lower)) and not _ABOUT_KW_RX.search(query_lower):
+        # Check if the word after "about" is followed by a number (build/execution pattern)
+        # If so, skip this match as it's likely a build query
+        if not _DIGIT_AFTER_RX.match(query_lower, about_match.end()):  # Not followed by a number
+            # Get the actual test name from original query to preserve camelCase
+            return ("script_summary", original_case_group(query, query_lower, about_match))
+    return None
+
+def match_top_scripts(query: str, query_lower: str, triggers: set):
+    # Top 10 flaky/failing scripts detection - using contains for flexibility
+    if "flaky" in triggers or "failing" in triggers:
+        # Extract number if present (shared by both branches)
+        limit = int(number_match.group(1)) if (number_match := _TOP_N_RX.search(query_lower)) else 10
+        # Flaky takes precedence when both words are present
+        return ("top_flaky" if "flaky" in triggers else "top_failing", limit)
+    return None
+
+def match_flaky_summary(query: str, query_lower: str, triggers: set):
+    if _FLAKY_RX.search(query_lower):
+        return ("flaky_summary", None)
+    return None
+
+def match_build_comparison(query: str, query_lower: str, triggers: set):
+    if (match := _COMPARISON_EXECS_RX.search(query_lower)):
+        # Two execution numbers specified
+        return ("build_comparison", tuple(g for g in match.groups() if g is not None))
+    normalized = _WHITESPACE_RX.sub(" ", query_lower)
+    if any(phrase in normalized for phrase in _FIXED_COMPARISON_PHRASES):
+        # Time-based or implicit comparison
+        return ("build_comparison", None)
+    return None
+
+# Detectors in priority order, each keyed by the trigger words it needs
+# Build summary detection - MUST come before script summary to avoid conflicts
+_SUMMARY_DETECTORS = (
+    (_BUILD_TRIGGERS, match_build_summary),
+    (_SCRIPT_TRIGGERS, match_script_summary),
+    (frozenset({"summary"}), match_summary_about),
+    (frozenset({"about"}), match_about_name),
+    (frozenset({"top"}), match_top_scripts),
+    (frozenset({"summary"}), match_flaky_summary),
+    (_COMPARISON_TRIGGERS, match_build_comparison),
+)
+
+# Helper function to detect summary requests
+def detect_summary_request(query: str) -> tuple[str, Optional[str]]:
+    """
+    Detect if the query is asking for a summary.
+    Returns: (summary_type, script_name_or_execution)
+    Summary types: 'build_summary', 'script_summary', 'flaky_summary', None
+    """
+    query_lower = query.lower()
+    # Plain substring checks find which pattern families can match; most queries
+    # are not summary requests and are ruled out here before any regex work
+    triggers = {word for word in _TRIGGER_WORDS if word in query_lower}
+    if not triggers:
+        return (None, None)
+    
+    # Only detectors whose trigger words appear in the query are run
+    for detector_triggers, detector in _SUMMARY_DETECTORS:
+        if not triggers.isdisjoint(detector_triggers):
+            if (detected := detector(query, query_lower, triggers)):
+                return detected
+    
+    return (None, None)
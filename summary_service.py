@@ -375,9 +375,8 @@ from(bucket: "testexecution")
   |> rename(columns: {{_value: "failure_stack"}})
 '''
         
-        # Execute both queries
-        status_result = FluxQueryService.execute_flux_query(status_query)
-        failure_result = FluxQueryService.execute_flux_query(failure_query)
+        # Execute both queries; they are independent, so they run concurrently
+        status_result, failure_result = FluxQueryService.execute_flux_queries(status_query, failure_query)
         
         if not status_result["success"]:
             return {